@@ -1,7 +1,7 @@
 # app/api/admin.py
 
 from fastapi import APIRouter, Depends, HTTPException, status, Query, Body
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, contains_eager
 from typing import List, Optional, Dict, Any
 from datetime import datetime, timedelta
 from app.core.database import get_db
@@ -43,7 +43,8 @@ async def get_all_transactions(
     """Get all transactions with filtering"""
     validate_admin_rights(db, current_user.id)
 
-    query = db.query(Transaction).join(User)
+    query = db.query(Transaction).join(User).options(
+        contains_eager(Transaction.user))
 
     if transaction_type:
         query = query.filter(Transaction.transaction_type == transaction_type)
@@ -1,6 +1,8 @@
 # app/api/utils.py
 
+import inspect
 import logging
+import re
 from datetime import datetime
 from functools import wraps
 from typing import Dict, Any, Callable, Optional
@@ -10,6 +12,9 @@ from app.models.user import User
 
 logger = logging.getLogger(__name__)
 
+# TRC20 address: 'T' followed by 33 base58 characters
+_TRC20 = re.compile(r"\AT[1-9A-HJ-NP-Za-km-z]{33}\Z")
+
 
 def handle_operation_errors(operation_name: str):
     """Decorator for unified error handling"""
@@ -44,7 +49,7 @@ def handle_operation_errors(operation_name: str):
                 )
 
         # Return appropriate wrapper based on function type
-        if hasattr(func, '__code__') and 'await' in func.__code__.co_names:
+        if inspect.iscoroutinefunction(func):
             return async_wrapper
         else:
             return sync_wrapper
@@ -159,7 +164,7 @@ def format_currency_amount(amount: float, currency: str = "USDT") -> str:
 def validate_address_format(address: str, network: str = "TRC20") -> bool:
     """Validate cryptocurrency address format"""
     if network == "TRC20":
-        return bool(address and len(address) == 34 and address.startswith('T'))
+        return bool(address) and _TRC20.match(address) is not None
     return False
 
 
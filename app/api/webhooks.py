@@ -35,6 +35,17 @@ async def blockchain_webhook(
     return await WebhookHandlers.handle_blockchain_webhook(request, background_tasks, db)
 
 
+@router.post("/blockchain/batch")
+@handle_operation_errors("process blockchain webhook batch")
+async def blockchain_webhook_batch(
+    request: Request,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db)
+):
+    """Handle a batch of blockchain confirmation webhooks"""
+    return await WebhookHandlers.handle_blockchain_webhook_batch(request, background_tasks, db)
+
+
 @router.get("/health")
 async def webhook_health():
     """Webhook endpoint health check"""
@@ -43,6 +54,7 @@ async def webhook_health():
         "service": "webhook_handler",
         "endpoints": [
             "/webhooks/payment",
-            "/webhooks/blockchain"
+            "/webhooks/blockchain",
+            "/webhooks/blockchain/batch"
         ]
     }
\ No newline at end of file
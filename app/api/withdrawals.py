@@ -1,6 +1,7 @@
 # app/api/withdrawals.py
 
 from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy import select, update
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from datetime import datetime
@@ -169,18 +170,39 @@ async def cancel_withdrawal(
             detail=f"Cannot cancel withdrawal with status: {transaction.withdrawal_status.value}"
         )
 
-    # Cancel transaction
-    transaction.withdrawal_status = WithdrawalStatusEnum.cancelled
-    transaction.processed_at = datetime.utcnow()
-    transaction.comment = "Cancelled by user"
+    # Cancel transaction; the status guard lets only one concurrent cancel win
+    cancelled_id = db.execute(
+        update(Transaction)
+        .where(Transaction.id == transaction.id,
+               Transaction.withdrawal_status.in_(
+                   [WithdrawalStatusEnum.requested,
+                    WithdrawalStatusEnum.pending]))
+        .values(withdrawal_status=WithdrawalStatusEnum.cancelled,
+                processed_at=datetime.utcnow(),
+                comment="Cancelled by user")
+        .returning(Transaction.id)
+    ).scalar_one_or_none()
+
+    if cancelled_id is None:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Cannot cancel withdrawal with status: {transaction.withdrawal_status.value}"
+        )
 
-    # Refund amount to balance
-    user_balance = db.query(Balance).filter(
-        Balance.user_id == current_user.id).first()
-    if user_balance:
-        fee_amount = settings.calculate_withdrawal_fee(transaction.amount)
-        refund_amount = transaction.amount + fee_amount
-        user_balance.amount += refund_amount
+    # Refund amount to balance in a single UPDATE ... RETURNING; user_id is
+    # not unique, so only the user's first balance row is credited
+    fee_amount = settings.calculate_withdrawal_fee(transaction.amount)
+    refund_amount = transaction.amount + fee_amount
+    balance_id = select(Balance.id).where(
+        Balance.user_id == current_user.id
+    ).order_by(Balance.id).limit(1).scalar_subquery()
+    new_balance = db.execute(
+        update(Balance)
+        .where(Balance.id == balance_id)
+        .values(amount=Balance.amount + refund_amount)
+        .returning(Balance.amount)
+    ).scalar_one_or_none()
 
     db.commit()
 
@@ -194,8 +216,8 @@ async def cancel_withdrawal(
 
     return create_success_response("withdrawal_cancelled", {
         "transaction_id": transaction.id,
-        "refunded_amount": refund_amount if user_balance else transaction.amount,
-        "new_balance": user_balance.amount if user_balance else "unknown",
+        "refunded_amount": refund_amount if new_balance is not None else transaction.amount,
+        "new_balance": new_balance if new_balance is not None else "unknown",
         "message": "Withdrawal cancelled and amount refunded",
         "sync_result": sync_result
     }, current_user.id)
\ No newline at end of file
@@ -28,6 +28,8 @@ class Settings(BaseSettings):
                                 env="JWT_SECRET_KEY")
     JWT_ALGORITHM: str = "HS256"
     JWT_ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+    PASSWORD_HASH_ITERATIONS: int = Field(default=100000,
+                                          env="PASSWORD_HASH_ITERATIONS")
 
     TRON_API_URL: str = Field(default="https://api.trongrid.io",
                               env="TRON_API_URL")
@@ -84,6 +86,11 @@ class Settings(BaseSettings):
     WITHDRAWAL_FEE_MAXIMUM: float = Field(default=50.0,
                                           env="WITHDRAWAL_FEE_MAXIMUM")
 
+    WEBHOOK_IDEMPOTENCY_CACHE_SIZE: int = Field(
+        default=10000, env="WEBHOOK_IDEMPOTENCY_CACHE_SIZE")
+    WEBHOOK_IDEMPOTENCY_TTL_SECONDS: int = Field(
+        default=300, env="WEBHOOK_IDEMPOTENCY_TTL_SECONDS")
+
     def calculate_withdrawal_fee(self, amount: float) -> float:
         fee = amount * self.WITHDRAWAL_FEE_PERCENTAGE
         return max(min(fee, self.WITHDRAWAL_FEE_MAXIMUM),
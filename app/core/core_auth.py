@@ -17,20 +17,33 @@ logger = logging.getLogger(__name__)
 security = HTTPBearer()
 
 
+# Stored as pbkdf2_sha256$<iterations>$<salt>$<hex digest>, so changing
+# PASSWORD_HASH_ITERATIONS leaves existing hashes verifiable
+_HASH_SCHEME = "pbkdf2_sha256"
+
+# Older hashes are salt + hex digest, made with the then-fixed count
+_LEGACY_HASH_ITERATIONS = 100000
+
+
+def _pbkdf2_hex(password: str, salt: str, iterations: int) -> str:
+    return hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'),
+                               salt.encode('utf-8'), iterations).hex()
+
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify password against hash using secure comparison"""
     try:
-        # Простая проверка с солью
-        salt = hashed_password[:32]  # Первые 32 символа - соль
-        password_hash = hashed_password[32:]  # Остальное - хеш
-
-        # Создаем хеш из пароля и соли
-        computed_hash = hashlib.pbkdf2_hmac('sha256',
-                                            plain_password.encode('utf-8'),
-                                            salt.encode('utf-8'),
-                                            100000)
-
-        return computed_hash.hex() == password_hash
+        if hashed_password.startswith(_HASH_SCHEME + "$"):
+            _, iterations, salt, password_hash = hashed_password.split("$")
+            iterations = int(iterations)
+        else:
+            # Простая проверка с солью
+            salt = hashed_password[:32]  # Первые 32 символа - соль
+            password_hash = hashed_password[32:]  # Остальное - хеш
+            iterations = _LEGACY_HASH_ITERATIONS
+
+        computed_hash = _pbkdf2_hex(plain_password, salt, iterations)
+        return secrets.compare_digest(computed_hash, password_hash)
     except Exception as e:
         logger.error(f"Password verification error: {str(e)}")
         return False
@@ -41,15 +54,10 @@ def get_password_hash(password: str) -> str:
     try:
         # Генерируем соль
         salt = secrets.token_hex(16)  # 32 символа
+        iterations = settings.PASSWORD_HASH_ITERATIONS
 
-        # Создаем хеш пароля
-        password_hash = hashlib.pbkdf2_hmac('sha256',
-                                            password.encode('utf-8'),
-                                            salt.encode('utf-8'),
-                                            100000)
-
-        # Возвращаем соль + хеш
-        return salt + password_hash.hex()
+        password_hash = _pbkdf2_hex(password, salt, iterations)
+        return f"{_HASH_SCHEME}${iterations}${salt}${password_hash}"
     except Exception as e:
         logger.error(f"Password hashing error: {str(e)}")
         raise ValueError(f"Cannot hash password: {str(e)}")
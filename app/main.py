@@ -3,7 +3,7 @@
 import logging
 import traceback
 from fastapi import FastAPI, Request
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, ORJSONResponse
 from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
 from starlette.exceptions import HTTPException as StarletteHTTPException
@@ -19,7 +19,8 @@ logger = logging.getLogger(__name__)
 app = FastAPI(
     title=settings.PROJECT_NAME,
     description="USDT TRC-20 payment processing system",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse
 )
 
 app.add_middleware(
@@ -47,10 +48,12 @@ async def catch_exceptions_middleware(request: Request, call_next):
 # from app.api.deposits import router as deposits_router
 # from app.api.withdrawals import router as withdrawals_router
 # from app.api.admin import router as admin_router
+from app.api.webhooks import router as webhooks_router
 
 # app.include_router(deposits_router, prefix="/api/deposits", tags=["deposits"])
 # app.include_router(withdrawals_router, prefix="/api/withdrawals", tags=["withdrawals"])
 # app.include_router(admin_router, prefix="/api/admin", tags=["admin"])
+app.include_router(webhooks_router, prefix="/api/webhooks", tags=["webhooks"])
 
 @app.get("/", tags=["status"])
 def root():
@@ -2,7 +2,7 @@
 
 import enum
 from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, \
-    Enum, Text
+    Enum, Text, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from app.core.database import Base
@@ -33,6 +33,14 @@ class TransactionPurposeEnum(enum.Enum):
 
 class Transaction(Base):
     __tablename__ = "transactions"
+    __table_args__ = (
+        # Per-user history filtered by type
+        Index("ix_tx_user_type", "user_id", "transaction_type"),
+        # Blockchain webhook matching by address, status and amount
+        Index("ix_tx_addr_status_amount", "wallet_address",
+              "withdrawal_status", "amount"),
+    )
+    __mapper_args__ = {"eager_defaults": True}
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -9,6 +9,8 @@ from app.core.database import Base
 
 class User(Base):
     __tablename__ = "users"
+    # Fetch server-side defaults in the INSERT/UPDATE itself
+    __mapper_args__ = {"eager_defaults": True}
 
     id = Column(Integer, primary_key=True, index=True)
     username = Column(String, unique=True, index=True, nullable=False)
@@ -31,9 +33,11 @@ class User(Base):
 
 class Balance(Base):
     __tablename__ = "balances"
+    __mapper_args__ = {"eager_defaults": True}
 
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False,
+                     index=True)
     amount = Column(Float, default=0.0, nullable=False)
 
     created_at = Column(DateTime, server_default=func.now())
@@ -2,7 +2,7 @@
 
 import enum
 from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, \
-    Enum
+    Enum, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from app.core.database import Base
@@ -16,6 +16,11 @@ class AddressStatusEnum(enum.Enum):
 
 class WalletAddress(Base):
     __tablename__ = "wallet_addresses"
+    __table_args__ = (
+        # Pool lookups for available addresses
+        Index("ix_wallet_status_active", "status", "is_active"),
+    )
+    __mapper_args__ = {"eager_defaults": True}
 
     id = Column(Integer, primary_key=True, index=True)
     address = Column(String(100), unique=True, index=True, nullable=False)
@@ -34,6 +39,7 @@ class WalletAddress(Base):
 
 class AddressReservation(Base):
     __tablename__ = "address_reservations"
+    __mapper_args__ = {"eager_defaults": True}
 
     id = Column(Integer, primary_key=True, index=True)
     address_id = Column(Integer, ForeignKey("wallet_addresses.id"),
@@ -2,7 +2,7 @@
 
 import logging
 from datetime import datetime, timedelta
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, joinedload
 from sqlalchemy import and_, func, or_
 from typing import List, Dict, Any, Optional
 from contextlib import contextmanager
@@ -225,7 +225,9 @@ class AddressPoolService:
         """Clean up expired reservations"""
         now = datetime.utcnow()
         
-        expired_reservations = db.query(AddressReservation).filter(
+        expired_reservations = db.query(AddressReservation).options(
+            joinedload(AddressReservation.address)
+        ).filter(
             AddressReservation.status == "active",
             AddressReservation.expires_at < now
         ).all()
@@ -3,7 +3,7 @@
 import logging
 import asyncio
 from datetime import datetime, timedelta
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, contains_eager
 from typing import List, Dict, Any, Optional
 import httpx
 import base58
@@ -61,6 +61,9 @@ class BlockchainMonitorService:
             WalletAddress, AddressReservation.address_id == WalletAddress.id
         ).join(
             Transaction, AddressReservation.transaction_id == Transaction.id
+        ).options(
+            contains_eager(AddressReservation.address),
+            contains_eager(AddressReservation.transaction)
         ).filter(
             AddressReservation.status == "active",
             AddressReservation.expires_at > datetime.utcnow(),
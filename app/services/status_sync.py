@@ -1,9 +1,10 @@
 # app/services/status_sync.py
 
 from datetime import datetime
+from sqlalchemy import case, lambda_stmt, select, update
 from sqlalchemy.orm import Session
 from fastapi import HTTPException
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 from app.core.config import settings
 from app.models.user import User, Balance
 from app.models.transaction import Transaction, TransactionTypeEnum, \
@@ -65,39 +66,161 @@ class UnifiedStatusSyncService:
             logger.info(
                 f"User {user.id} status changed: {old_status} -> {new_status}")
 
-            return {
-                "user_id": user.id,
-                "transaction_id": transaction_id,
-                "old_status": old_status.value if old_status else None,
-                "new_status": new_status.value if new_status else None,
-                "changed": True,
-                "source": source,
-                "balance_deduction": balance_deduction_result,
-                "timestamp": datetime.utcnow().isoformat()
+        return UnifiedStatusSyncService._sync_result(
+            user.id, transaction_id, old_status, new_status, source,
+            balance_deduction_result)
+
+    @staticmethod
+    def sync_user_status_on_transactions_batch(
+            db: Session,
+            transaction_ids: List[int],
+            source: str = "unknown"
+    ) -> Dict[str, Any]:
+        """Sync user statuses for several transactions, each user only once"""
+        try:
+            transactions = {
+                transaction.id: transaction
+                for transaction in db.scalars(select(Transaction).where(
+                    Transaction.id.in_(transaction_ids)))
             }
-        else:
+            old_statuses = dict(db.execute(
+                select(User.id, User.user_withdrawal_status).where(User.id.in_(
+                    {transaction.user_id
+                     for transaction in transactions.values()}))
+            ).all())
+
+            logger.info(
+                f"Batch syncing {len(old_statuses)} users for {len(transactions)} transactions from {source}")
+
+            # Balance deduction once per user with a completed tax_payment
+            balance_deductions = {}
+            for transaction in transactions.values():
+                if (transaction.user_id in old_statuses and
+                        transaction.user_id not in balance_deductions and
+                        transaction.transaction_purpose == TransactionPurposeEnum.tax_payment and
+                        transaction.withdrawal_status == WithdrawalStatusEnum.completed):
+                    balance_deductions[transaction.user_id] = \
+                        UnifiedStatusSyncService._deduct_balance_on_tax_completion(
+                            db, transaction.user_id, commit=False)
+
+            new_statuses = UnifiedStatusSyncService._calculate_correct_user_statuses(
+                db, list(old_statuses))
+            changed_statuses = {
+                user_id: new_status
+                for user_id, new_status in new_statuses.items()
+                if old_statuses[user_id] != new_status
+            }
+
+            # One UPDATE for every changed user, one commit for the batch
+            if changed_statuses:
+                db.execute(update(User).where(
+                    User.id.in_(changed_statuses)
+                ).values(user_withdrawal_status=case(changed_statuses,
+                                                     value=User.id)))
+            if changed_statuses or balance_deductions:
+                db.commit()
+
+        except Exception as e:
+            logger.error(f"Error batch syncing user statuses: {e}")
+            db.rollback()
+            raise
+
+        results = []
+        for transaction_id in transaction_ids:
+            transaction = transactions.get(transaction_id)
+            if not transaction:
+                results.append({"error": "Transaction not found",
+                                "transaction_id": transaction_id})
+                continue
+            if transaction.user_id not in old_statuses:
+                results.append({"error": "User not found",
+                                "user_id": transaction.user_id})
+                continue
+
+            user_id = transaction.user_id
+            results.append(UnifiedStatusSyncService._sync_result(
+                user_id, transaction_id, old_statuses[user_id],
+                new_statuses[user_id], source,
+                balance_deductions.get(user_id)))
+
+        return {
+            "results": results,
+            "synced_users": len(old_statuses),
+            "changed_users": len(changed_statuses),
+            "source": source,
+            "timestamp": datetime.utcnow().isoformat()
+        }
+
+    @staticmethod
+    def _sync_result(user_id: int, transaction_id: int, old_status,
+                     new_status, source: str,
+                     balance_deduction: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """Result of syncing one transaction's user"""
+        if old_status != new_status:
             return {
-                "user_id": user.id,
+                "user_id": user_id,
                 "transaction_id": transaction_id,
-                "current_status": old_status.value if old_status else None,
-                "changed": False,
+                "old_status": old_status,
+                "new_status": new_status,
+                "changed": True,
                 "source": source,
-                "balance_deduction": balance_deduction_result,
-                "message": "Status is already correct",
+                "balance_deduction": balance_deduction,
                 "timestamp": datetime.utcnow().isoformat()
             }
+        return {
+            "user_id": user_id,
+            "transaction_id": transaction_id,
+            "current_status": old_status,
+            "changed": False,
+            "source": source,
+            "balance_deduction": balance_deduction,
+            "message": "Status is already correct",
+            "timestamp": datetime.utcnow().isoformat()
+        }
 
     @staticmethod
     def _calculate_correct_user_status(db: Session, user_id: int):
         """Calculate what the user's status should be based on transactions"""
-        # Check for active withdrawal requests
-        active_withdrawal = db.query(Transaction).filter(
-            Transaction.user_id == user_id,
+        # Check for active withdrawal requests; only the two deciding columns
+        # are selected, and lambda_stmt keeps the compiled statement cached
+        active_statuses = UnifiedStatusSyncService.ACTIVE_REGULAR_WITHDRAWAL_STATUSES
+        active_withdrawal = db.execute(lambda_stmt(
+            lambda: select(Transaction.withdrawal_status,
+                           Transaction.transaction_purpose).where(
+                Transaction.user_id == user_id,
+                Transaction.transaction_type == TransactionTypeEnum.withdrawal,
+                Transaction.withdrawal_status.in_(active_statuses)
+            ).limit(1)
+        )).first()
+
+        return UnifiedStatusSyncService._status_for_active_withdrawal(
+            active_withdrawal)
+
+    @staticmethod
+    def _calculate_correct_user_statuses(db: Session,
+                                         user_ids: List[int]) -> Dict[int, str]:
+        """Calculate the correct status of several users with one query"""
+        # First active withdrawal per user, like the single-user LIMIT 1
+        active_withdrawals = {}
+        for row in db.execute(select(
+                Transaction.user_id, Transaction.withdrawal_status,
+                Transaction.transaction_purpose).where(
+            Transaction.user_id.in_(user_ids),
             Transaction.transaction_type == TransactionTypeEnum.withdrawal,
             Transaction.withdrawal_status.in_(
                 UnifiedStatusSyncService.ACTIVE_REGULAR_WITHDRAWAL_STATUSES)
-        ).first()
+        ).order_by(Transaction.id)):
+            active_withdrawals.setdefault(row.user_id, row)
+
+        return {
+            user_id: UnifiedStatusSyncService._status_for_active_withdrawal(
+                active_withdrawals.get(user_id))
+            for user_id in user_ids
+        }
 
+    @staticmethod
+    def _status_for_active_withdrawal(active_withdrawal) -> str:
+        """User status implied by an active withdrawal row, or its absence"""
         if active_withdrawal:
             # Determine status based on withdrawal purpose and status
             if active_withdrawal.transaction_purpose == TransactionPurposeEnum.regular:
@@ -112,12 +235,13 @@ class UnifiedStatusSyncService:
         return "available"
 
     @staticmethod
-    def _deduct_balance_on_tax_completion(db: Session, user_id: int) -> Dict[
+    def _deduct_balance_on_tax_completion(db: Session, user_id: int,
+                                          commit: bool = True) -> Dict[
         str, Any]:
         """Deduct balance when tax payment is completed"""
         try:
-            user_balance = db.query(Balance).filter(
-                Balance.user_id == user_id).first()
+            user_balance = db.scalars(select(Balance).where(
+                Balance.user_id == user_id).limit(1)).first()
             if not user_balance:
                 return {"error": "User balance not found"}
 
@@ -135,7 +259,8 @@ class UnifiedStatusSyncService:
 
             if user_balance.amount >= tax_amount:
                 user_balance.amount -= tax_amount
-                db.commit()
+                if commit:
+                    db.commit()
 
                 logger.info(
                     f"Deducted {tax_amount} from user {user_id} balance for tax payment")
@@ -180,8 +305,8 @@ class UnifiedStatusSyncService:
 
             return {
                 "user_id": user_id,
-                "old_status": old_status.value if old_status else None,
-                "new_status": correct_status.value if correct_status else None,
+                "old_status": old_status,
+                "new_status": correct_status,
                 "changed": True,
                 "method": "force_sync",
                 "timestamp": datetime.utcnow().isoformat()
@@ -189,7 +314,7 @@ class UnifiedStatusSyncService:
         else:
             return {
                 "user_id": user_id,
-                "current_status": old_status.value if old_status else None,
+                "current_status": old_status,
                 "changed": False,
                 "method": "force_sync",
                 "message": "Status is already correct",
@@ -218,8 +343,8 @@ class UnifiedStatusSyncService:
 
                     synced_users.append({
                         "user_id": user.id,
-                        "old_status": old_status.value if old_status else None,
-                        "new_status": correct_status.value if correct_status else None
+                        "old_status": old_status,
+                        "new_status": correct_status
                     })
 
                     logger.info(
@@ -265,6 +390,18 @@ def hook_transaction_completed(db: Session, transaction_id: int,
                                            f"completion_via_{completion_method}")
 
 
+def hook_transactions_completed(db: Session, transaction_ids: List[int],
+                                completion_method: str = "unknown"):
+    """Hook - call once when several transactions are completed together"""
+    try:
+        return UnifiedStatusSyncService.sync_user_status_on_transactions_batch(
+            db, transaction_ids, f"completion_via_{completion_method}")
+    except Exception as e:
+        logger.error(
+            f"Failed to sync user statuses for transactions {transaction_ids}: {e}")
+        return {"error": str(e)}
+
+
 def hook_webhook_processed(db: Session, transaction_id: int,
                            webhook_type: str = "unknown"):
     """Hook - call when webhook is processed"""
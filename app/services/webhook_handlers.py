@@ -1,10 +1,15 @@
 # app/services/webhook_handlers.py
 
+import copy
 import logging
+import time
+import orjson
+from collections import OrderedDict
 from datetime import datetime
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 from fastapi import Request, BackgroundTasks, HTTPException, status
-from typing import Dict, Any
+from typing import Callable, Dict, Any, Hashable, List, Optional, Tuple
 from app.models.transaction import Transaction, WithdrawalStatusEnum
 from app.models.user import User
 from app.core.config import settings
@@ -12,9 +17,107 @@ from app.core.config import settings
 logger = logging.getLogger(__name__)
 
 
+async def _read_json(request: Request) -> Any:
+    """Decode the webhook body with orjson rather than the stdlib parser"""
+    return orjson.loads(await request.body())
+
+
+def _is_number(value: Any) -> bool:
+    """True for JSON numbers; bool is an int subclass but not a number here"""
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+class InMemoryIdempotencyStore:
+    """Process-local LRU of webhook results; entries expire after a TTL
+
+    Each worker process has its own copy. Deployments running several
+    workers install a shared store (e.g. Redis SET with EX) exposing the
+    same get/set/clear methods via WebhookHandlers.set_idempotency_store.
+    """
+
+    def __init__(self, max_size: int, ttl_seconds: float,
+                 clock: Callable[[], float] = time.monotonic):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        # key -> (expiry on the store's clock, result), least recent first
+        self._entries: "OrderedDict[Hashable, Tuple[float, Dict[str, Any]]]" = \
+            OrderedDict()
+
+    def get(self, key: Hashable) -> Optional[Dict[str, Any]]:
+        """Return a copy of the stored result, None if missing or expired"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, result = entry
+        if expires_at <= self._clock():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return copy.deepcopy(result)
+
+    def set(self, key: Hashable, result: Dict[str, Any]) -> None:
+        """Store a copy of a result, evicting the least recent entries"""
+        self._entries[key] = (self._clock() + self.ttl_seconds,
+                              copy.deepcopy(result))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Forget all stored results"""
+        self._entries.clear()
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.get(key) is not None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
 class WebhookHandlers:
     """Service for processing payment and blockchain webhooks"""
 
+    # Processed results by (webhook, transaction_id, idempotency_key)
+    idempotency_store = InMemoryIdempotencyStore(
+        settings.WEBHOOK_IDEMPOTENCY_CACHE_SIZE,
+        settings.WEBHOOK_IDEMPOTENCY_TTL_SECONDS)
+
+    @staticmethod
+    def set_idempotency_store(store) -> None:
+        """Use another store, e.g. one shared by all workers"""
+        WebhookHandlers.idempotency_store = store
+
+    @staticmethod
+    def _idempotency_cache_key(webhook: str, transaction_id: Any,
+                               idempotency_key: Any) -> Optional[Tuple[str, Any, Any]]:
+        """Cache key for a delivery, or None if it can't be deduplicated"""
+        # Only plain str/int JSON values; lists and objects are unhashable
+        for value in (transaction_id, idempotency_key):
+            if isinstance(value, bool) or not isinstance(value, (str, int)):
+                return None
+        return webhook, transaction_id, idempotency_key
+
+    @staticmethod
+    def _cached_result(key: Optional[Tuple[str, Any, Any]]) -> Optional[Dict[str, Any]]:
+        """Return the stored result for a repeated delivery"""
+        if key is None:
+            return None
+        return WebhookHandlers.idempotency_store.get(key)
+
+    @staticmethod
+    def _remember_result(key: Optional[Tuple[str, Any, Any]],
+                         result: Dict[str, Any]) -> None:
+        """Store a processed result for repeated deliveries"""
+        if key is None:
+            return
+        WebhookHandlers.idempotency_store.set(key, result)
+
+    @staticmethod
+    def clear_idempotency_cache() -> None:
+        """Forget all remembered webhook results"""
+        WebhookHandlers.idempotency_store.clear()
+
     @staticmethod
     async def handle_payment_webhook(
             request: Request,
@@ -23,19 +126,29 @@ class WebhookHandlers:
     ) -> Dict[str, Any]:
         """Handle payment system webhook"""
         try:
-            payload = await request.json()
+            payload = await _read_json(request)
             logger.info(f"Received payment webhook: {payload}")
 
             transaction_id = payload.get("transaction_id")
             payment_status = payload.get("status")
+            idempotency_key = payload.get("idempotency_key")
+
+            # A repeated delivery gets the first result without a DB lookup
+            cache_key = WebhookHandlers._idempotency_cache_key(
+                "payment", transaction_id, idempotency_key)
+            cached = WebhookHandlers._cached_result(cache_key)
+            if cached is not None:
+                logger.info(
+                    f"Duplicate payment webhook {idempotency_key}, returning stored result")
+                return cached
 
             if not transaction_id:
                 logger.error("Missing transaction_id in webhook payload")
                 return {"status": "error", "reason": "Missing transaction_id"}
 
-            transaction = db.query(Transaction).filter(
+            transaction = db.scalars(select(Transaction).where(
                 Transaction.id == transaction_id
-            ).first()
+            ).limit(1)).first()
 
             if not transaction:
                 logger.error(f"Transaction {transaction_id} not found")
@@ -63,13 +176,15 @@ class WebhookHandlers:
 
                 logger.info(f"User status sync result: {sync_result}")
 
-                return {
+                result = {
                     "status": "success",
                     "transaction_id": transaction.id,
                     "user_id": user.id,
                     "withdrawal_status": transaction.withdrawal_status.value,
                     "sync_result": sync_result
                 }
+                WebhookHandlers._remember_result(cache_key, result)
+                return result
 
             elif payment_status == "failed":
                 transaction.withdrawal_status = WithdrawalStatusEnum.rejected
@@ -79,12 +194,14 @@ class WebhookHandlers:
                 logger.info(
                     f"Transaction {transaction.id} marked as rejected via webhook")
 
-                return {
+                result = {
                     "status": "processed",
                     "transaction_id": transaction.id,
                     "user_id": user.id,
                     "withdrawal_status": transaction.withdrawal_status.value
                 }
+                WebhookHandlers._remember_result(cache_key, result)
+                return result
             else:
                 logger.warning(f"Unsupported payment status: {payment_status}")
                 return {"status": "error",
@@ -97,6 +214,79 @@ class WebhookHandlers:
                 detail=f"Error processing webhook: {str(e)}"
             )
 
+    @staticmethod
+    def _check_blockchain_event(payload: Any,
+                                required_confirmations: int) -> Optional[Dict[str, Any]]:
+        """Result for an event that confirms nothing, None if it can be matched"""
+        # A malformed event gets an error result instead of a 500
+        if not isinstance(payload, dict):
+            return {"status": "error", "reason": "Event must be a JSON object"}
+
+        event_type = payload.get("event_type")
+        if event_type != "transaction_confirmed":
+            logger.info(
+                f"Ignoring blockchain webhook with event type: {event_type}")
+            return {"status": "ignored",
+                    "reason": f"Unsupported event type: {event_type}"}
+
+        confirmations = payload.get("confirmations", 0)
+        if not _is_number(confirmations):
+            return {"status": "error", "reason": "Invalid confirmations"}
+
+        txid = payload.get("txid")
+        if confirmations < required_confirmations:
+            logger.info(
+                f"Not enough confirmations: {confirmations}/{required_confirmations}")
+            return {
+                "status": "pending",
+                "txid": txid,
+                "confirmations": confirmations,
+                "required_confirmations": required_confirmations
+            }
+
+        if (not isinstance(payload.get("address"), str) or
+                not _is_number(payload.get("amount")) or
+                not (txid is None or isinstance(txid, str))):
+            return {"status": "error",
+                    "reason": "Invalid address, amount or txid"}
+
+        return None
+
+    @staticmethod
+    def _no_match_result(address: str, amount: float) -> Dict[str, Any]:
+        """Result for a confirmed event without a pending transaction"""
+        logger.warning(
+            f"No matching transaction found for address {address}, amount {amount}")
+        return {"status": "no_match", "address": address, "amount": amount}
+
+    @staticmethod
+    def _confirm_transaction(transaction: Transaction, payload: Dict[str, Any],
+                             processed_at: datetime) -> None:
+        """Mark a matched transaction completed by a blockchain event"""
+        transaction.withdrawal_status = WithdrawalStatusEnum.completed
+        transaction.processed_at = processed_at
+        transaction.txid = payload.get("txid")
+        transaction.comment = \
+            f"Blockchain confirmed: {payload.get('confirmations', 0)} confirmations"
+
+    @staticmethod
+    def _confirmed_result(transaction: Transaction, payload: Dict[str, Any],
+                          sync_result: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """Result for a transaction completed by a blockchain event"""
+        if settings.auto_complete_enabled:
+            return {
+                "status": "auto_completed",
+                "transaction_id": transaction.id,
+                "confirmations": payload.get("confirmations", 0),
+                "auto_sync_result": sync_result
+            }
+        return {
+            "status": "confirmed",
+            "transaction_id": transaction.id,
+            "confirmations": payload.get("confirmations", 0),
+            "note": "Auto-completion disabled, manual review required"
+        }
+
     @staticmethod
     async def handle_blockchain_webhook(
             request: Request,
@@ -105,57 +295,35 @@ class WebhookHandlers:
     ) -> Dict[str, Any]:
         """Handle blockchain confirmation webhook"""
         try:
-            payload = await request.json()
+            payload = await _read_json(request)
             logger.info(f"Received blockchain webhook: {payload}")
 
-            event_type = payload.get("event_type")
-            if event_type != "transaction_confirmed":
-                logger.info(
-                    f"Ignoring blockchain webhook with event type: {event_type}")
-                return {"status": "ignored",
-                        "reason": f"Unsupported event type: {event_type}"}
+            result = WebhookHandlers._check_blockchain_event(
+                payload, settings.current_confirmations_required)
+            if result is not None:
+                return result
 
-            txid = payload.get("txid")
-            confirmations = payload.get("confirmations", 0)
+            # Find transaction by address and amount
             address = payload.get("address")
             amount = payload.get("amount")
-            token = payload.get("token")
-
-            required_confirmations = settings.current_confirmations_required
-            if confirmations < required_confirmations:
-                logger.info(
-                    f"Not enough confirmations: {confirmations}/{required_confirmations}")
-                return {
-                    "status": "pending",
-                    "txid": txid,
-                    "confirmations": confirmations,
-                    "required_confirmations": required_confirmations
-                }
-
-            # Find transaction by address and amount
-            transaction = db.query(Transaction).filter(
+            transaction = db.scalars(select(Transaction).where(
                 Transaction.wallet_address == address,
-                Transaction.amount == amount,
-                Transaction.withdrawal_status == WithdrawalStatusEnum.pending
-            ).first()
+                Transaction.withdrawal_status == WithdrawalStatusEnum.pending,
+                Transaction.amount == amount
+            ).limit(1)).first()
 
             if not transaction:
-                logger.warning(
-                    f"No matching transaction found for address {address}, amount {amount}")
-                return {"status": "no_match", "address": address,
-                        "amount": amount}
-
-            # Update transaction
-            transaction.withdrawal_status = WithdrawalStatusEnum.completed
-            transaction.processed_at = datetime.utcnow()
-            transaction.txid = txid
-            transaction.comment = f"Blockchain confirmed: {confirmations} confirmations"
+                return WebhookHandlers._no_match_result(address, amount)
+
+            WebhookHandlers._confirm_transaction(transaction, payload,
+                                                 datetime.utcnow())
             db.commit()
 
             logger.info(
                 f"Transaction {transaction.id} confirmed via blockchain webhook")
 
             # Auto-complete if enabled
+            sync_result = None
             if settings.auto_complete_enabled:
                 from app.services.status_sync import hook_transaction_completed
                 sync_result = hook_transaction_completed(db, transaction.id,
@@ -163,23 +331,113 @@ class WebhookHandlers:
 
                 logger.info(f"Auto-completion sync result: {sync_result}")
 
-                return {
-                    "status": "auto_completed",
-                    "transaction_id": transaction.id,
-                    "confirmations": confirmations,
-                    "auto_sync_result": sync_result
-                }
-            else:
-                return {
-                    "status": "confirmed",
-                    "transaction_id": transaction.id,
-                    "confirmations": confirmations,
-                    "note": "Auto-completion disabled, manual review required"
-                }
+            return WebhookHandlers._confirmed_result(transaction, payload,
+                                                     sync_result)
 
         except Exception as e:
             logger.exception(f"Error processing blockchain webhook: {str(e)}")
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail=f"Error processing blockchain webhook: {str(e)}"
-            )
\ No newline at end of file
+            )
+
+    @staticmethod
+    async def handle_blockchain_webhook_batch(
+            request: Request,
+            background_tasks: BackgroundTasks,
+            db: Session
+    ) -> Dict[str, Any]:
+        """Handle a list of blockchain confirmation events in one commit"""
+        try:
+            events = await _read_json(request)
+            if not isinstance(events, list):
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="Expected a JSON array of blockchain events"
+                )
+
+            logger.info(f"Received blockchain webhook batch: {len(events)} events")
+
+            required_confirmations = settings.current_confirmations_required
+            results: List[Optional[Dict[str, Any]]] = [
+                WebhookHandlers._check_blockchain_event(payload,
+                                                        required_confirmations)
+                for payload in events
+            ]
+            confirmable = [index for index, result in enumerate(results)
+                           if result is None]
+
+            # One lookup for every address in the batch instead of one per event
+            candidates: Dict[tuple, List[Transaction]] = {}
+            addresses = {events[index]["address"] for index in confirmable}
+            if addresses:
+                for transaction in db.query(Transaction).filter(
+                        Transaction.wallet_address.in_(addresses),
+                        Transaction.withdrawal_status == WithdrawalStatusEnum.pending
+                ).order_by(Transaction.id):
+                    candidates.setdefault(
+                        (transaction.wallet_address, transaction.amount),
+                        []).append(transaction)
+
+            completed = []
+            now = datetime.utcnow()
+            for index in confirmable:
+                payload = events[index]
+                address = payload["address"]
+                amount = payload["amount"]
+
+                # Each pending transaction is matched by at most one event
+                matches = candidates.get((address, amount))
+                if not matches:
+                    results[index] = WebhookHandlers._no_match_result(address,
+                                                                      amount)
+                    continue
+
+                transaction = matches.pop(0)
+                WebhookHandlers._confirm_transaction(transaction, payload, now)
+                completed.append((index, transaction))
+
+            sync_results: Dict[int, Dict[str, Any]] = {}
+            if completed:
+                db.commit()
+                logger.info(
+                    f"{len(completed)} transactions confirmed via blockchain webhook batch")
+
+                # One status sync for all users touched by the batch
+                if settings.auto_complete_enabled:
+                    from app.services.status_sync import \
+                        hook_transactions_completed
+                    batch_sync = hook_transactions_completed(
+                        db, [transaction.id for _, transaction in completed],
+                        "blockchain_webhook")
+                    logger.info(f"Auto-completion sync result: {batch_sync}")
+                    if "error" in batch_sync:
+                        sync_results = {transaction.id: batch_sync
+                                        for _, transaction in completed}
+                    else:
+                        sync_results = {
+                            result.get("transaction_id"): result
+                            for result in batch_sync["results"]
+                        }
+
+            for index, transaction in completed:
+                results[index] = WebhookHandlers._confirmed_result(
+                    transaction, events[index],
+                    sync_results.get(transaction.id))
+
+            return {
+                "status": "processed",
+                "processed": len(events),
+                "completed": len(completed),
+                "results": results
+            }
+
+        except HTTPException:
+            raise
+        except Exception as e:
+            logger.exception(
+                f"Error processing blockchain webhook batch: {str(e)}")
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Error processing blockchain webhook batch: {str(e)}"
+            )
@@ -5,6 +5,7 @@ if "%1"=="" goto help
 if "%1"=="install" goto install
 if "%1"=="test" goto test
 if "%1"=="test-fast" goto test-fast
+if "%1"=="test-parallel" goto test-parallel
 if "%1"=="test-coverage" goto test-coverage
 if "%1"=="test-auth" goto test-auth
 if "%1"=="test-deposits" goto test-deposits
@@ -14,6 +15,8 @@ if "%1"=="test-webhooks" goto test-webhooks
 if "%1"=="test-models" goto test-models
 if "%1"=="test-services" goto test-services
 if "%1"=="test-integration" goto test-integration
+if "%1"=="test-benchmark" goto test-benchmark
+if "%1"=="test-benchmark-compare" goto test-benchmark-compare
 if "%1"=="clean" goto clean
 if "%1"=="help" goto help
 goto help
@@ -24,6 +27,7 @@ echo.
 echo   test.bat install          - Install dependencies
 echo   test.bat test              - Run all tests with coverage
 echo   test.bat test-fast         - Run tests without coverage (faster)
+echo   test.bat test-parallel     - Run tests across all CPU cores
 echo   test.bat test-coverage     - Run tests with detailed coverage
 echo   test.bat test-auth         - Run authentication tests
 echo   test.bat test-deposits     - Run deposit tests
@@ -33,6 +37,8 @@ echo   test.bat test-webhooks     - Run webhook tests
 echo   test.bat test-models       - Run model tests
 echo   test.bat test-services     - Run service tests
 echo   test.bat test-integration  - Run integration tests
+echo   test.bat test-benchmark    - Save a performance benchmark baseline
+echo   test.bat test-benchmark-compare - Compare benchmarks to the baseline
 echo   test.bat clean             - Clean up generated files
 echo.
 goto end
@@ -40,7 +46,7 @@ goto end
 :install
 echo Installing dependencies...
 pip install -r requirements.txt
-pip install pytest pytest-asyncio pytest-cov pytest-mock
+pip install pytest pytest-asyncio pytest-cov pytest-mock pytest-xdist
 echo Dependencies installed successfully!
 goto end
 
@@ -54,6 +60,11 @@ echo Running tests without coverage...
 pytest -v --no-cov -x
 goto end
 
+:test-parallel
+echo Running tests in parallel...
+pytest -n auto --no-cov
+goto end
+
 :test-coverage
 echo Running tests with detailed coverage...
 pytest --cov=app --cov-report=html:htmlcov --cov-report=term-missing --cov-report=xml --cov-fail-under=80
@@ -101,6 +112,16 @@ echo Running integration tests...
 pytest tests\test_integration.py -v
 goto end
 
+:test-benchmark
+echo Saving performance benchmark baseline...
+pytest tests -n 0 --no-cov --benchmark-only --benchmark-save=baseline
+goto end
+
+:test-benchmark-compare
+echo Comparing performance benchmarks to the baseline...
+pytest tests -n 0 --no-cov --benchmark-only --benchmark-compare --benchmark-compare-fail=median:10%%
+goto end
+
 :clean
 echo Cleaning up generated files...
 if exist htmlcov rmdir /s /q htmlcov
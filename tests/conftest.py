@@ -1,5 +1,6 @@
 # tests/conftest.py
 
+import os
 import sys
 from pathlib import Path
 
@@ -7,23 +8,36 @@ from pathlib import Path
 project_root = Path(__file__).parent.parent
 sys.path.insert(0, str(project_root))
 
+# Cheap password hashing for tests; must be set before app settings load
+os.environ.setdefault("PASSWORD_HASH_ITERATIONS", "1000")
+
 import pytest
+import pytest_asyncio
 import asyncio
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.pool import StaticPool
 from app.main import app
+from app.core.config import settings
 from app.core.database import get_db, Base
 from app.core.core_auth import create_access_token, get_password_hash
 from app.models.user import User, Balance
 from app.models.wallet import WalletAddress, AddressStatusEnum
 from app.models.transaction import Transaction, TransactionTypeEnum, \
     WithdrawalStatusEnum
+from app.services.webhook_handlers import WebhookHandlers, \
+    InMemoryIdempotencyStore
 from datetime import datetime, timedelta
+from tests.helpers import bearer_headers, token_for
 
-# Test database setup
-SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
+# Test database setup: in-memory SQLite, one connection shared by the
+# test session and the app's get_db override via StaticPool. The shared
+# cache keeps any extra connection on the same database instead of a
+# blank one. Each pytest-xdist worker is its own process and so gets its
+# own database.
+SQLALCHEMY_DATABASE_URL = "sqlite:///file::memory:?cache=shared&uri=true"
 
 engine = create_engine(
     SQLALCHEMY_DATABASE_URL,
@@ -31,22 +45,51 @@ engine = create_engine(
         "check_same_thread": False,
     },
     poolclass=StaticPool,
+    # room for every distinct statement the suite compiles, so repeated
+    # lookups reuse the compiled form
+    query_cache_size=1200,
 )
+# autoflush is off, so setup blocks only hit the database on an explicit
+# flush() or commit(); no per-block no_autoflush guard is needed
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False,
-                                   bind=engine)
+                                   bind=engine, expire_on_commit=False)
+
+
+# pysqlite opens transactions lazily and breaks SAVEPOINTs; take over
+# transaction control so nested transactions work as documented. SQLite
+# also leaves foreign keys unenforced unless asked per connection, and may
+# still spill sorts and temp indexes to disk files for an in-memory
+# database.
+@event.listens_for(engine, "connect")
+def _configure_sqlite(dbapi_connection, connection_record):
+    dbapi_connection.isolation_level = None
+    dbapi_connection.execute("PRAGMA foreign_keys=ON")
+    dbapi_connection.execute("PRAGMA temp_store=MEMORY")
+
 
+@event.listens_for(engine, "begin")
+def _emit_begin(conn):
+    conn.exec_driver_sql("BEGIN")
 
-def override_get_db():
+
+# Session of the running test, shared with the app so API calls see and
+# roll back with the test's own rows
+_test_session = None
+
+
+# An async generator runs on the event loop; a sync one would send every
+# request's dependency setup and teardown through the threadpool
+async def override_get_db():
+    if _test_session is not None:
+        yield _test_session
+        return
+    db = TestingSessionLocal()
     try:
-        db = TestingSessionLocal()
         yield db
     finally:
         db.close()
 
 
-app.dependency_overrides[get_db] = override_get_db
-
-
 @pytest.fixture(scope="session")
 def event_loop():
     """Create an instance of the default event loop for the test session."""
@@ -57,47 +100,68 @@ def event_loop():
 
 @pytest.fixture(scope="session", autouse=True)
 def setup_test_db():
-    """Create test database tables"""
+    """Create test database tables and route get_db to them once"""
     Base.metadata.create_all(bind=engine)
+    app.dependency_overrides[get_db] = override_get_db
     yield
+    app.dependency_overrides.clear()
     Base.metadata.drop_all(bind=engine)
 
 
 @pytest.fixture
 def db():
-    """Create a fresh database session for each test"""
+    """Session inside a transaction that is rolled back after the test"""
+    global _test_session
     connection = engine.connect()
     transaction = connection.begin()
-    session = TestingSessionLocal(bind=connection)
+    # Commits from the test or the app release a SAVEPOINT, leaving the
+    # outer transaction for teardown to roll back
+    session = TestingSessionLocal(bind=connection,
+                                  join_transaction_mode="create_savepoint")
+    _test_session = session
 
     yield session
 
+    _test_session = None
     session.close()
     transaction.rollback()
     connection.close()
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def client():
     """FastAPI test client"""
     with TestClient(app) as c:
         yield c
 
 
+@pytest_asyncio.fixture(scope="session")
+async def async_client():
+    """Async client calling the ASGI app directly, without a thread hop"""
+    async with AsyncClient(transport=ASGITransport(app=app),
+                           base_url="http://test") as ac:
+        yield ac
+
+
+@pytest.fixture(scope="session")
+def known_hash():
+    """Password hash for "testpass123", computed once per session"""
+    return get_password_hash("testpass123")
+
+
 @pytest.fixture
-def test_user(db):
+def test_user(db, known_hash):
     """Create a test user"""
     user = User(
         username="testuser",
-        password_hash=get_password_hash("testpass123"),
+        password_hash=known_hash,
         email="test@example.com",
         full_name="Test User",
         is_active=True,
         is_admin=False
     )
     db.add(user)
-    db.commit()
-    db.refresh(user)
+    db.flush()  # assign user.id; committed together with the balance
 
     # Create balance
     balance = Balance(user_id=user.id, amount=1000.0)
@@ -107,20 +171,25 @@ def test_user(db):
     return user
 
 
+@pytest.fixture(scope="session")
+def admin_hash():
+    """Password hash for "adminpass123", computed once per session"""
+    return get_password_hash("adminpass123")
+
+
 @pytest.fixture
-def admin_user(db):
+def admin_user(db, admin_hash):
     """Create a test admin user"""
     admin = User(
         username="adminuser",
-        password_hash=get_password_hash("adminpass123"),
+        password_hash=admin_hash,
         email="admin@example.com",
         full_name="Admin User",
         is_active=True,
         is_admin=True
     )
     db.add(admin)
-    db.commit()
-    db.refresh(admin)
+    db.flush()
 
     # Create balance
     balance = Balance(user_id=admin.id, amount=5000.0)
@@ -130,28 +199,34 @@ def admin_user(db):
     return admin
 
 
+@pytest.fixture(scope="session")
+def test_token():
+    """JWT token signed once per session"""
+    return create_access_token(data={"sub": "123", "username": "testuser"})
+
+
 @pytest.fixture
 def user_token(test_user):
     """Create JWT token for test user"""
-    return create_access_token(data={"sub": str(test_user.id)})
+    return token_for(test_user.id)
 
 
 @pytest.fixture
 def admin_token(admin_user):
     """Create JWT token for admin user"""
-    return create_access_token(data={"sub": str(admin_user.id)})
+    return token_for(admin_user.id)
 
 
 @pytest.fixture
 def auth_headers(user_token):
     """Authorization headers for regular user"""
-    return {"Authorization": f"Bearer {user_token}"}
+    return bearer_headers(user_token)
 
 
 @pytest.fixture
 def admin_headers(admin_token):
     """Authorization headers for admin user"""
-    return {"Authorization": f"Bearer {admin_token}"}
+    return bearer_headers(admin_token)
 
 
 @pytest.fixture
@@ -165,7 +240,6 @@ def test_wallet_address(db):
     )
     db.add(address)
     db.commit()
-    db.refresh(address)
     return address
 
 
@@ -183,7 +257,6 @@ def test_deposit_transaction(db, test_user, test_wallet_address):
     )
     db.add(transaction)
     db.commit()
-    db.refresh(transaction)
     return transaction
 
 
@@ -201,10 +274,42 @@ def test_withdrawal_transaction(db, test_user):
     )
     db.add(transaction)
     db.commit()
-    db.refresh(transaction)
     return transaction
 
 
+@pytest.fixture
+def settings_override(monkeypatch):
+    """Override app settings for one test, undone at teardown"""
+    settings_class = type(settings)
+
+    def _apply(**overrides):
+        for name, value in overrides.items():
+            attr = getattr(settings_class, name, None)
+            if isinstance(attr, property):
+                # Read-only derived settings: swap the property itself
+                monkeypatch.setattr(settings_class, name,
+                                    property(lambda self, value=value: value))
+            elif callable(attr):
+                # pydantic refuses non-field attributes on the instance, so
+                # helpers like calculate_withdrawal_fee are replaced on the
+                # class with one returning the given value
+                monkeypatch.setattr(
+                    settings_class, name,
+                    lambda self, *args, value=value, **kwargs: value)
+            else:
+                monkeypatch.setattr(settings, name, value)
+
+    return _apply
+
+
+@pytest.fixture
+def idempotency_cache(monkeypatch):
+    """Fresh in-memory webhook idempotency store for one test"""
+    store = InMemoryIdempotencyStore(max_size=100, ttl_seconds=60)
+    monkeypatch.setattr(WebhookHandlers, "idempotency_store", store)
+    return store
+
+
 @pytest.fixture
 def mock_tron_api_success():
     """Mock successful TronGrid API response"""
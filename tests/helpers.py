@@ -0,0 +1,47 @@
+# tests/helpers.py
+# Plain helpers shared by test modules; not collected by pytest
+
+import importlib.util
+import orjson
+import pytest
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Any, Mapping
+from app.core.core_auth import create_access_token
+
+# pytest-benchmark comes from tests/test_requirements.txt; timing tests
+# skip where only requirements.txt is installed. Save and compare baselines
+# with "test.bat test-benchmark" / "test.bat test-benchmark-compare"
+requires_benchmark = pytest.mark.skipif(
+    importlib.util.find_spec("pytest_benchmark") is None,
+    reason="pytest-benchmark is not installed")
+
+
+def json_body(response) -> Any:
+    """Parse a response body with orjson instead of stdlib json"""
+    return orjson.loads(response.content)
+
+
+def post_json(client, url: str, data: Any, **kwargs):
+    """POST data serialized with orjson instead of TestClient's json.dumps"""
+    headers = {**kwargs.pop("headers", {}),
+               "Content-Type": "application/json"}
+    return client.post(url, content=orjson.dumps(data), headers=headers,
+                       **kwargs)
+
+
+@lru_cache(maxsize=None)
+def token_for(user_id: int) -> str:
+    """Sign each user's JWT once per session and reuse it"""
+    return create_access_token(data={"sub": str(user_id)})
+
+
+@lru_cache(maxsize=None)
+def bearer_headers(token: str) -> Mapping[str, str]:
+    """Read-only Authorization header mapping, built once per token"""
+    return MappingProxyType({"Authorization": f"Bearer {token}"})
+
+
+def headers_for(user_id: int) -> Mapping[str, str]:
+    """Authorization headers for a user id; merge with {**headers, ...}"""
+    return bearer_headers(token_for(user_id))
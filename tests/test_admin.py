@@ -2,6 +2,7 @@
 
 import pytest
 from fastapi.testclient import TestClient
+from tests.helpers import post_json
 from unittest.mock import patch, MagicMock
 from app.models.transaction import Transaction, TransactionTypeEnum, \
     WithdrawalStatusEnum
@@ -13,7 +14,7 @@ class TestWithdrawalAPI:
     """Test withdrawal API endpoints"""
 
     def test_request_withdrawal_success(self, client: TestClient, auth_headers,
-                                        test_user, db):
+                                        test_user, db, settings_override):
         """Test successful withdrawal request"""
         # Ensure user has sufficient balance
         balance = db.query(Balance).filter(
@@ -23,33 +24,31 @@ class TestWithdrawalAPI:
 
         request_data = {
             "amount": 100.0,
-            "wallet_address": "TDestination123456789012345678901"
+            "wallet_address": "TDestination1234567891234567891234"
         }
 
-        with patch(
-                'app.core.config.settings.calculate_withdrawal_fee') as mock_fee:
-            mock_fee.return_value = 5.0  # 5 USDT fee
+        settings_override(calculate_withdrawal_fee=5.0)  # 5 USDT fee
 
-            response = client.post("/api/withdrawals/request",
-                                   json=request_data, headers=auth_headers)
-            assert response.status_code == 200
+        response = post_json(client, "/api/withdrawals/request",
+                             request_data, headers=auth_headers)
+        assert response.status_code == 200
 
-            data = response.json()
-            assert data["status"] == "success"
-            assert data["operation"] == "withdrawal_requested"
-
-            withdrawal_data = data["data"]
-            assert withdrawal_data["amount"] == 100.0
-            assert withdrawal_data["fee_amount"] == 5.0
-            assert withdrawal_data["total_deducted"] == 105.0
-            assert withdrawal_data["wallet_address"] == request_data[
-                "wallet_address"]
-            assert withdrawal_data["status"] == "requested"
-            assert withdrawal_data["remaining_balance"] == 895.0  # 1000 - 105
+        data = response.json()
+        assert data["status"] == "success"
+        assert data["operation"] == "withdrawal_requested"
+
+        withdrawal_data = data["data"]
+        assert withdrawal_data["amount"] == 100.0
+        assert withdrawal_data["fee_amount"] == 5.0
+        assert withdrawal_data["total_deducted"] == 105.0
+        assert withdrawal_data["wallet_address"] == request_data[
+            "wallet_address"]
+        assert withdrawal_data["status"] == "requested"
+        assert withdrawal_data["remaining_balance"] == 895.0  # 1000 - 105
 
     def test_request_withdrawal_insufficient_balance(self, client: TestClient,
                                                      auth_headers, test_user,
-                                                     db):
+                                                     db, settings_override):
         """Test withdrawal request with insufficient balance"""
         # Set low balance
         balance = db.query(Balance).filter(
@@ -59,28 +58,26 @@ class TestWithdrawalAPI:
 
         request_data = {
             "amount": 100.0,
-            "wallet_address": "TDestination123456789012345678901"
+            "wallet_address": "TDestination1234567891234567891234"
         }
 
-        with patch(
-                'app.core.config.settings.calculate_withdrawal_fee') as mock_fee:
-            mock_fee.return_value = 5.0
+        settings_override(calculate_withdrawal_fee=5.0)
 
-            response = client.post("/api/withdrawals/request",
-                                   json=request_data, headers=auth_headers)
-            assert response.status_code == 400
-            assert "Insufficient balance" in response.json()["detail"]
+        response = post_json(client, "/api/withdrawals/request",
+                             request_data, headers=auth_headers)
+        assert response.status_code == 400
+        assert "Insufficient balance" in response.json()["detail"]
 
     def test_request_withdrawal_amount_too_small(self, client: TestClient,
                                                  auth_headers):
         """Test withdrawal request with amount below minimum"""
         request_data = {
             "amount": 2.0,  # Below minimum (5.0)
-            "wallet_address": "TDestination123456789012345678901"
+            "wallet_address": "TDestination1234567891234567891234"
         }
 
-        response = client.post("/api/withdrawals/request", json=request_data,
-                               headers=auth_headers)
+        response = post_json(client, "/api/withdrawals/request",
+                             request_data, headers=auth_headers)
         assert response.status_code == 400
         assert "Amount must be between" in response.json()["detail"]
 
@@ -89,11 +86,11 @@ class TestWithdrawalAPI:
         """Test withdrawal request with amount above maximum"""
         request_data = {
             "amount": 10000.0,  # Above maximum (5000.0)
-            "wallet_address": "TDestination123456789012345678901"
+            "wallet_address": "TDestination1234567891234567891234"
         }
 
-        response = client.post("/api/withdrawals/request", json=request_data,
-                               headers=auth_headers)
+        response = post_json(client, "/api/withdrawals/request",
+                             request_data, headers=auth_headers)
         assert response.status_code == 400
         assert "Amount must be between" in response.json()["detail"]
 
@@ -114,8 +111,8 @@ class TestWithdrawalAPI:
                 "wallet_address": address
             }
 
-            response = client.post("/api/withdrawals/request",
-                                   json=request_data, headers=auth_headers)
+            response = post_json(client, "/api/withdrawals/request",
+                                 request_data, headers=auth_headers)
             assert response.status_code == 400
             assert "Invalid TRC20 wallet address format" in response.json()[
                 "detail"]
@@ -124,10 +121,11 @@ class TestWithdrawalAPI:
         """Test withdrawal request without authentication"""
         request_data = {
             "amount": 100.0,
-            "wallet_address": "TDestination123456789012345678901"
+            "wallet_address": "TDestination1234567891234567891234"
         }
 
-        response = client.post("/api/withdrawals/request", json=request_data)
+        response = post_json(client, "/api/withdrawals/request",
+                             request_data)
         assert response.status_code == 401
 
     def test_get_user_withdrawals_empty(self, client: TestClient,
@@ -193,7 +191,7 @@ class TestWithdrawalAPI:
         assert len(data["data"]["withdrawals"]) == 2
 
     def test_cancel_withdrawal_success(self, client: TestClient, auth_headers,
-                                       test_user, db):
+                                       test_user, db, settings_override):
         """Test successful withdrawal cancellation"""
         # Create withdrawal transaction
         transaction = Transaction(
@@ -201,7 +199,7 @@ class TestWithdrawalAPI:
             amount=100.0,
             transaction_type=TransactionTypeEnum.withdrawal,
             withdrawal_status=WithdrawalStatusEnum.requested,
-            wallet_address="TDestination123456789012345678901",
+            wallet_address="TDestination1234567891234567891234",
             comment="Test withdrawal"
         )
         db.add(transaction)
@@ -212,27 +210,25 @@ class TestWithdrawalAPI:
             Balance.user_id == test_user.id).first()
         original_balance = balance.amount
 
-        with patch(
-                'app.core.config.settings.calculate_withdrawal_fee') as mock_fee:
-            mock_fee.return_value = 5.0
+        settings_override(calculate_withdrawal_fee=5.0)
 
-            response = client.post(f"/api/withdrawals/{transaction.id}/cancel",
-                                   headers=auth_headers)
-            assert response.status_code == 200
+        response = client.post(f"/api/withdrawals/{transaction.id}/cancel",
+                               headers=auth_headers)
+        assert response.status_code == 200
 
-            data = response.json()
-            assert data["status"] == "success"
-            assert data["data"]["transaction_id"] == transaction.id
-            assert data["data"]["refunded_amount"] == 105.0  # 100 + 5 fee
+        data = response.json()
+        assert data["status"] == "success"
+        assert data["data"]["transaction_id"] == transaction.id
+        assert data["data"]["refunded_amount"] == 105.0  # 100 + 5 fee
 
-            # Check transaction status updated
-            db.refresh(transaction)
-            assert transaction.withdrawal_status == WithdrawalStatusEnum.cancelled
-            assert transaction.comment == "Cancelled by user"
+        # Check transaction status updated
+        db.refresh(transaction)
+        assert transaction.withdrawal_status == WithdrawalStatusEnum.cancelled
+        assert transaction.comment == "Cancelled by user"
 
-            # Check balance refunded
-            db.refresh(balance)
-            assert balance.amount == original_balance + 105.0
+        # Check balance refunded
+        db.refresh(balance)
+        assert balance.amount == original_balance + 105.0
 
     def test_cancel_withdrawal_not_found(self, client: TestClient,
                                          auth_headers):
@@ -251,7 +247,7 @@ class TestWithdrawalAPI:
             amount=100.0,
             transaction_type=TransactionTypeEnum.withdrawal,
             withdrawal_status=WithdrawalStatusEnum.completed,
-            wallet_address="TDestination123456789012345678901"
+            wallet_address="TDestination1234567891234567891234"
         )
         db.add(transaction)
         db.commit()
@@ -271,7 +267,7 @@ class TestWithdrawalAPI:
             amount=100.0,
             transaction_type=TransactionTypeEnum.withdrawal,
             withdrawal_status=WithdrawalStatusEnum.requested,
-            wallet_address="TDestination123456789012345678901"
+            wallet_address="TDestination1234567891234567891234"
         )
         db.add(transaction)
         db.commit()
@@ -290,7 +286,8 @@ class TestWithdrawalValidation:
     """Test withdrawal request validation"""
 
     def test_withdrawal_amount_validation(self, client: TestClient,
-                                          auth_headers, test_user, db):
+                                          auth_headers, test_user, db,
+                                          settings_override):
         """Test various amount validation scenarios"""
         # Set high balance to avoid balance issues
         balance = db.query(Balance).filter(
@@ -306,24 +303,22 @@ class TestWithdrawalValidation:
             (50, 200),  # Valid amount
         ]
 
+        settings_override(calculate_withdrawal_fee=2.0)
+
         for amount, expected_status in test_cases:
             with patch(
-                    'app.core.config.settings.calculate_withdrawal_fee') as mock_fee:
-                mock_fee.return_value = 2.0
-
-                with patch(
-                        'app.services.status_sync.hook_transaction_status_changed'):
-                    request_data = {
-                        "amount": amount,
-                        "wallet_address": "TDestination123456789012345678901"
-                    }
-                    response = client.post("/api/withdrawals/request",
-                                           json=request_data,
-                                           headers=auth_headers)
-                    assert response.status_code == expected_status
+                    'app.services.status_sync.hook_transaction_status_changed'):
+                request_data = {
+                    "amount": amount,
+                    "wallet_address": "TDestination1234567891234567891234"
+                }
+                response = post_json(client, "/api/withdrawals/request",
+                                     request_data, headers=auth_headers)
+                assert response.status_code == expected_status
 
     def test_withdrawal_address_validation(self, client: TestClient,
-                                           auth_headers, test_user, db):
+                                           auth_headers, test_user, db,
+                                           settings_override):
         """Test wallet address validation"""
         # Set sufficient balance
         balance = db.query(Balance).filter(
@@ -332,9 +327,9 @@ class TestWithdrawalValidation:
         db.commit()
 
         valid_addresses = [
-            "TDestination123456789012345678901",
-            "T1234567890123456789012345678901234",
-            "TXYZ567890123456789012345678901234"
+            "TDestination1234567891234567891234",
+            "T123456789123456789123456789123456",
+            "TXYZ567891234567891234567891234567"
         ]
 
         invalid_addresses = [
@@ -346,21 +341,18 @@ class TestWithdrawalValidation:
         ]
 
         # Test valid addresses
-        with patch(
-                'app.core.config.settings.calculate_withdrawal_fee') as mock_fee:
-            mock_fee.return_value = 5.0
+        settings_override(calculate_withdrawal_fee=5.0)
 
-            with patch(
-                    'app.services.status_sync.hook_transaction_status_changed'):
-                for address in valid_addresses:
-                    request_data = {
-                        "amount": 50.0,
-                        "wallet_address": address
-                    }
-                    response = client.post("/api/withdrawals/request",
-                                           json=request_data,
-                                           headers=auth_headers)
-                    assert response.status_code == 200
+        with patch(
+                'app.services.status_sync.hook_transaction_status_changed'):
+            for address in valid_addresses:
+                request_data = {
+                    "amount": 50.0,
+                    "wallet_address": address
+                }
+                response = post_json(client, "/api/withdrawals/request",
+                                     request_data, headers=auth_headers)
+                assert response.status_code == 200
 
         # Test invalid addresses
         for address in invalid_addresses:
@@ -368,8 +360,8 @@ class TestWithdrawalValidation:
                 "amount": 50.0,
                 "wallet_address": address
             }
-            response = client.post("/api/withdrawals/request",
-                                   json=request_data, headers=auth_headers)
+            response = post_json(client, "/api/withdrawals/request",
+                                 request_data, headers=auth_headers)
             assert response.status_code == 400
 
 
@@ -377,7 +369,8 @@ class TestWithdrawalIntegration:
     """Integration tests for withdrawal flow"""
 
     def test_full_withdrawal_request_flow(self, client: TestClient,
-                                          auth_headers, test_user, db):
+                                          auth_headers, test_user, db,
+                                          settings_override):
         """Test complete withdrawal request flow"""
         # Setup sufficient balance
         balance = db.query(Balance).filter(
@@ -386,73 +379,72 @@ class TestWithdrawalIntegration:
         balance.amount = initial_balance
         db.commit()
 
+        settings_override(calculate_withdrawal_fee=10.0)
+
         with patch(
-                'app.core.config.settings.calculate_withdrawal_fee') as mock_fee:
-            with patch(
-                    'app.services.status_sync.hook_transaction_status_changed') as mock_sync:
-                mock_fee.return_value = 10.0
-                mock_sync.return_value = {"changed": True}
+                'app.services.status_sync.hook_transaction_status_changed') as mock_sync:
+            mock_sync.return_value = {"changed": True}
 
-                # Request withdrawal
-                request_data = {
-                    "amount": 200.0,
-                    "wallet_address": "TDestination123456789012345678901"
-                }
-                response = client.post("/api/withdrawals/request",
-                                       json=request_data, headers=auth_headers)
+            # Request withdrawal
+            request_data = {
+                "amount": 200.0,
+                "wallet_address": "TDestination1234567891234567891234"
+            }
+            response = post_json(client, "/api/withdrawals/request",
+                                 request_data, headers=auth_headers)
 
-                assert response.status_code == 200
-                data = response.json()
-                transaction_id = data["data"]["transaction_id"]
-
-                # Verify transaction in database
-                transaction = db.query(Transaction).filter(
-                    Transaction.id == transaction_id).first()
-                assert transaction is not None
-                assert transaction.amount == 200.0
-                assert transaction.transaction_type == TransactionTypeEnum.withdrawal
-                assert transaction.withdrawal_status == WithdrawalStatusEnum.requested
-                assert transaction.wallet_address == request_data[
-                    "wallet_address"]
-                assert transaction.user_id == test_user.id
-
-                # Verify balance deducted
-                db.refresh(balance)
-                expected_balance = initial_balance - 200.0 - 10.0  # amount + fee
-                assert balance.amount == expected_balance
-
-                # Verify status sync was called
-                mock_sync.assert_called_once()
+            assert response.status_code == 200
+            data = response.json()
+            transaction_id = data["data"]["transaction_id"]
+
+            # Verify transaction in database
+            transaction = db.query(Transaction).filter(
+                Transaction.id == transaction_id).first()
+            assert transaction is not None
+            assert transaction.amount == 200.0
+            assert transaction.transaction_type == TransactionTypeEnum.withdrawal
+            assert transaction.withdrawal_status == WithdrawalStatusEnum.requested
+            assert transaction.wallet_address == request_data[
+                "wallet_address"]
+            assert transaction.user_id == test_user.id
+
+            # Verify balance deducted
+            db.refresh(balance)
+            expected_balance = initial_balance - 200.0 - 10.0  # amount + fee
+            assert balance.amount == expected_balance
+
+            # Verify status sync was called
+            mock_sync.assert_called_once()
 
     def test_withdrawal_balance_deduction(self, client: TestClient,
-                                          auth_headers, test_user, db):
+                                          auth_headers, test_user, db,
+                                          settings_override):
         """Test that withdrawal properly deducts balance"""
         balance = db.query(Balance).filter(
             Balance.user_id == test_user.id).first()
         balance.amount = 500.0
         db.commit()
 
-        with patch(
-                'app.core.config.settings.calculate_withdrawal_fee') as mock_fee:
-            with patch(
-                    'app.services.status_sync.hook_transaction_status_changed'):
-                mock_fee.return_value = 8.0
+        settings_override(calculate_withdrawal_fee=8.0)
 
-                request_data = {
-                    "amount": 100.0,
-                    "wallet_address": "TDestination123456789012345678901"
-                }
+        with patch(
+                'app.services.status_sync.hook_transaction_status_changed'):
+            request_data = {
+                "amount": 100.0,
+                "wallet_address": "TDestination1234567891234567891234"
+            }
 
-                response = client.post("/api/withdrawals/request",
-                                       json=request_data, headers=auth_headers)
-                assert response.status_code == 200
+            response = post_json(client, "/api/withdrawals/request",
+                                 request_data, headers=auth_headers)
+            assert response.status_code == 200
 
-                # Check balance deducted
-                db.refresh(balance)
-                assert balance.amount == 392.0  # 500 - 100 - 8
+            # Check balance deducted
+            db.refresh(balance)
+            assert balance.amount == 392.0  # 500 - 100 - 8
 
     def test_withdrawal_cancellation_flow(self, client: TestClient,
-                                          auth_headers, test_user, db):
+                                          auth_headers, test_user, db,
+                                          settings_override):
         """Test complete withdrawal cancellation flow"""
         # Create withdrawal
         transaction = Transaction(
@@ -460,7 +452,7 @@ class TestWithdrawalIntegration:
             amount=150.0,
             transaction_type=TransactionTypeEnum.withdrawal,
             withdrawal_status=WithdrawalStatusEnum.pending,
-            wallet_address="TDestination123456789012345678901"
+            wallet_address="TDestination1234567891234567891234"
         )
         db.add(transaction)
 
@@ -470,28 +462,27 @@ class TestWithdrawalIntegration:
         balance.amount = 500.0  # Simulated post-withdrawal balance
         db.commit()
 
+        settings_override(calculate_withdrawal_fee=7.5)
+
         with patch(
-                'app.core.config.settings.calculate_withdrawal_fee') as mock_fee:
-            with patch(
-                    'app.services.status_sync.hook_transaction_status_changed') as mock_sync:
-                mock_fee.return_value = 7.5
-                mock_sync.return_value = {"changed": True}
-
-                # Cancel withdrawal
-                response = client.post(
-                    f"/api/withdrawals/{transaction.id}/cancel",
-                    headers=auth_headers)
-                assert response.status_code == 200
+                'app.services.status_sync.hook_transaction_status_changed') as mock_sync:
+            mock_sync.return_value = {"changed": True}
+
+            # Cancel withdrawal
+            response = client.post(
+                f"/api/withdrawals/{transaction.id}/cancel",
+                headers=auth_headers)
+            assert response.status_code == 200
 
-                # Verify transaction updated
-                db.refresh(transaction)
-                assert transaction.withdrawal_status == WithdrawalStatusEnum.cancelled
-                assert transaction.processed_at is not None
-                assert transaction.comment == "Cancelled by user"
+            # Verify transaction updated
+            db.refresh(transaction)
+            assert transaction.withdrawal_status == WithdrawalStatusEnum.cancelled
+            assert transaction.processed_at is not None
+            assert transaction.comment == "Cancelled by user"
 
-                # Verify balance refunded
-                db.refresh(balance)
-                assert balance.amount == 657.5  # 500 + 150 + 7.5
+            # Verify balance refunded
+            db.refresh(balance)
+            assert balance.amount == 657.5  # 500 + 150 + 7.5
 
-                # Verify status sync was called
-                mock_sync.assert_called_once()
\ No newline at end of file
+            # Verify status sync was called
+            mock_sync.assert_called_once()
\ No newline at end of file
@@ -1,33 +1,45 @@
 # tests/test_auth.py
 
+import hashlib
 import pytest
 from fastapi.testclient import TestClient
-from app.core.core_auth import verify_password, get_password_hash, \
-    create_access_token, verify_token
+from tests.helpers import post_json
+from app.core.core_auth import verify_password, verify_token
 from app.models.user import User, Balance
 
 
 class TestAuthService:
     """Test authentication service functions"""
 
-    def test_password_hashing(self):
+    def test_password_hashing(self, known_hash):
         """Test password hashing and verification"""
-        password = "testpassword123"
-        hashed = get_password_hash(password)
-
-        assert hashed != password
-        assert verify_password(password, hashed) is True
-        assert verify_password("wrongpassword", hashed) is False
-
-    def test_jwt_token_creation_and_verification(self):
+        password = "testpass123"
+
+        assert known_hash != password
+        assert verify_password(password, known_hash) is True
+        assert verify_password("wrongpassword", known_hash) is False
+
+    def test_password_hash_keeps_its_iteration_count(self, known_hash,
+                                                     monkeypatch):
+        """Test hashes still verify after the iteration setting changes"""
+        from app.core import config
+        monkeypatch.setattr(config.settings, "PASSWORD_HASH_ITERATIONS",
+                            config.settings.PASSWORD_HASH_ITERATIONS + 1)
+        assert verify_password("testpass123", known_hash) is True
+
+        # Legacy salt + hex digest hashes use the old fixed count
+        salt = "0" * 32
+        legacy_hash = salt + hashlib.pbkdf2_hmac(
+            'sha256', b"testpass123", salt.encode(), 100000).hex()
+        assert verify_password("testpass123", legacy_hash) is True
+        assert verify_password("wrongpassword", legacy_hash) is False
+
+    def test_jwt_token_creation_and_verification(self, test_token):
         """Test JWT token creation and verification"""
-        data = {"sub": "123", "username": "testuser"}
-        token = create_access_token(data)
-
-        assert token is not None
-        assert isinstance(token, str)
+        assert test_token is not None
+        assert isinstance(test_token, str)
 
-        payload = verify_token(token)
+        payload = verify_token(test_token)
         assert payload is not None
         assert payload["sub"] == "123"
         assert payload["username"] == "testuser"
@@ -51,7 +63,7 @@ class TestAuthAPI:
             "full_name": "New User"
         }
 
-        response = client.post("/api/auth/register", json=user_data)
+        response = post_json(client, "/api/auth/register", user_data)
         assert response.status_code == 200
 
         data = response.json()
@@ -126,7 +138,7 @@ class TestAuthValidation:
             "email": "different@example.com"
         }
 
-        response = client.post("/api/auth/register", json=user_data)
+        response = post_json(client, "/api/auth/register", user_data)
         assert response.status_code == 400
         assert "Username already registered" in response.json()["detail"]
 
@@ -138,7 +150,7 @@ class TestAuthValidation:
             "email": "newuser@example.com"
         }
 
-        response = client.post("/api/auth/register", json=user_data)
+        response = post_json(client, "/api/auth/register", user_data)
         assert response.status_code == 422
 
     def test_login_nonexistent_user(self, client: TestClient):
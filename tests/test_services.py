@@ -1,93 +1,217 @@
 # tests/test_services.py
 
+import orjson
 import pytest
-from unittest.mock import patch, MagicMock
-from datetime import datetime, timedelta
-from app.services.status_sync import UnifiedStatusSyncService
-from app.services.webhook_handlers import WebhookHandlers
+from types import SimpleNamespace
+from unittest.mock import Mock
+from fastapi import BackgroundTasks, HTTPException
+from datetime import datetime
+from sqlalchemy import event, insert, select
+from tests.helpers import requires_benchmark
+from app.services import status_sync
+from app.services.status_sync import UnifiedStatusSyncService, \
+    hook_transaction_completed, hook_transactions_completed
+from app.services.webhook_handlers import WebhookHandlers, \
+    InMemoryIdempotencyStore
 from app.models.user import User, Balance
 from app.models.transaction import Transaction, TransactionTypeEnum, \
     WithdrawalStatusEnum, TransactionPurposeEnum
-from app.models.wallet import WalletAddress, AddressStatusEnum
 
 
-class TestUnifiedStatusSyncService:
-    """Test status synchronization service"""
+# processed_at only has to be set; a fixed value keeps rows deterministic
+_FIXED_NOW = datetime(2024, 1, 1)
 
-    def test_calculate_correct_user_status_available(self, db, test_user):
-        """Test calculating user status when user has no active withdrawals"""
-        # No active withdrawals - should be available
-        status = UnifiedStatusSyncService._calculate_correct_user_status(db,
-                                                                         test_user.id)
-        assert status == "available"
+# What the stubbed status-sync hook reports back to the webhook handlers
+_SYNC_RESULT = {"changed": True}
 
-    def test_calculate_correct_user_status_withdrawal_requested(self, db,
-                                                                test_user):
-        """Test calculating user status with requested withdrawal"""
-        # Create requested withdrawal
-        transaction = Transaction(
-            user_id=test_user.id,
-            amount=100.0,
-            transaction_type=TransactionTypeEnum.withdrawal,
-            withdrawal_status=WithdrawalStatusEnum.requested,
-            transaction_purpose=TransactionPurposeEnum.regular
-        )
-        db.add(transaction)
-        db.commit()
 
-        status = UnifiedStatusSyncService._calculate_correct_user_status(db,
-                                                                         test_user.id)
-        assert status == "regular_withdrawal_requested"
+@pytest.fixture
+def make_webhook_request():
+    """Build a stand-in request whose body() coroutine returns payload"""
+    def _make(payload):
+        body = orjson.dumps(payload)
 
-    def test_calculate_correct_user_status_withdrawal_approved(self, db,
-                                                               test_user):
-        """Test calculating user status with approved withdrawal"""
-        transaction = Transaction(
-            user_id=test_user.id,
-            amount=100.0,
-            transaction_type=TransactionTypeEnum.withdrawal,
-            withdrawal_status=WithdrawalStatusEnum.approved,
-            transaction_purpose=TransactionPurposeEnum.regular
-        )
-        db.add(transaction)
-        db.commit()
+        async def _body():
+            return body
+        return SimpleNamespace(body=_body)
 
-        status = UnifiedStatusSyncService._calculate_correct_user_status(db,
-                                                                         test_user.id)
-        assert status == "regular_withdrawal_approved"
+    return _make
 
-    def test_calculate_correct_user_status_withdrawal_in_progress(self, db,
-                                                                  test_user):
-        """Test calculating user status with non-regular withdrawal"""
-        transaction = Transaction(
-            user_id=test_user.id,
-            amount=100.0,
-            transaction_type=TransactionTypeEnum.withdrawal,
-            withdrawal_status=WithdrawalStatusEnum.pending,
-            transaction_purpose=TransactionPurposeEnum.system_withdrawal
-        )
-        db.add(transaction)
-        db.commit()
+
+@pytest.fixture
+def insert_tax_payment(db):
+    """Insert a completed tax payment row without going through the ORM"""
+    def _insert(user_id, amount):
+        db.execute(insert(Transaction), [{
+            "user_id": user_id,
+            "amount": amount,
+            "transaction_type": TransactionTypeEnum.withdrawal,
+            "withdrawal_status": WithdrawalStatusEnum.completed,
+            "transaction_purpose": TransactionPurposeEnum.tax_payment,
+            "processed_at": _FIXED_NOW
+        }])
+
+    return _insert
+
+
+@pytest.fixture(scope="module")
+def background_tasks():
+    """Real, empty task queue; the handlers never schedule anything"""
+    return BackgroundTasks()
+
+
+@pytest.fixture(scope="module")
+def shared_sync_mock():
+    """One mock of the status-sync hook, built once for the module"""
+    return Mock(spec=hook_transaction_completed, return_value=_SYNC_RESULT)
+
+
+@pytest.fixture
+def sync_hook(monkeypatch, shared_sync_mock):
+    """Status-sync hook replaced by the shared mock, reset per test"""
+    shared_sync_mock.reset_mock()
+    monkeypatch.setattr(status_sync, "hook_transaction_completed",
+                        shared_sync_mock)
+    return shared_sync_mock
+
+
+@pytest.fixture
+def batch_sync_hook(monkeypatch):
+    """Batch status-sync hook replaced by a mock answering per transaction"""
+    def _sync(db, transaction_ids, completion_method):
+        return {"results": [{"transaction_id": transaction_id, **_SYNC_RESULT}
+                            for transaction_id in transaction_ids]}
+
+    hook = Mock(spec=hook_transactions_completed, side_effect=_sync)
+    monkeypatch.setattr(status_sync, "hook_transactions_completed", hook)
+    return hook
+
+
+@pytest.fixture
+def perf_users(db):
+    """Ten users, each with a balance and one requested withdrawal"""
+    # One statement per table
+    user_ids = db.scalars(
+        insert(User).returning(User.id, sort_by_parameter_order=True),
+        [
+            {
+                "username": f"perf_user_{i}",
+                "password_hash": "dummy_hash",
+                "email": f"perf_{i}@example.com",
+                "is_active": True
+            }
+            for i in range(10)
+        ]
+    ).all()
+
+    db.execute(insert(Balance), [
+        {"user_id": user_id, "amount": 1000.0} for user_id in user_ids
+    ])
+    db.execute(insert(Transaction), [
+        {
+            "user_id": user_id,
+            "amount": 100.0,
+            "transaction_type": TransactionTypeEnum.withdrawal,
+            "withdrawal_status": WithdrawalStatusEnum.requested,
+            "transaction_purpose": TransactionPurposeEnum.regular
+        }
+        for user_id in user_ids
+    ])
+    db.flush()
+    return user_ids
+
+
+@pytest.fixture
+def approved_withdrawal(db, test_user):
+    """Approved regular withdrawal for the test user"""
+    transaction = Transaction(
+        user_id=test_user.id,
+        amount=100.0,
+        transaction_type=TransactionTypeEnum.withdrawal,
+        withdrawal_status=WithdrawalStatusEnum.approved,
+        transaction_purpose=TransactionPurposeEnum.regular
+    )
+    db.add(transaction)
+    db.flush()
+    return transaction
+
+
+@pytest.mark.xdist_group("services_status_sync")
+class TestUnifiedStatusSyncService:
+    """Test status synchronization service"""
+
+    @pytest.mark.parametrize("withdrawal_status,purpose,expected", [
+        pytest.param(None, None, "available", id="available"),
+        pytest.param(WithdrawalStatusEnum.requested,
+                     TransactionPurposeEnum.regular,
+                     "regular_withdrawal_requested",
+                     id="withdrawal_requested"),
+        pytest.param(WithdrawalStatusEnum.approved,
+                     TransactionPurposeEnum.regular,
+                     "regular_withdrawal_approved",
+                     id="withdrawal_approved"),
+        pytest.param(WithdrawalStatusEnum.pending,
+                     TransactionPurposeEnum.system_withdrawal,
+                     "withdrawal_in_progress",
+                     id="withdrawal_in_progress"),
+    ])
+    def test_calculate_correct_user_status(self, db, test_user,
+                                           withdrawal_status, purpose,
+                                           expected):
+        """Test calculating user status from the user's active withdrawal"""
+        if withdrawal_status is not None:
+            db.add(Transaction(
+                user_id=test_user.id,
+                amount=100.0,
+                transaction_type=TransactionTypeEnum.withdrawal,
+                withdrawal_status=withdrawal_status,
+                transaction_purpose=purpose
+            ))
+            db.flush()
 
         status = UnifiedStatusSyncService._calculate_correct_user_status(db,
                                                                          test_user.id)
-        assert status == "withdrawal_in_progress"
+        assert status == expected
+
+    def test_calculate_correct_user_status_reuses_compiled_statement(self,
+                                                                     db,
+                                                                     test_user):
+        """Test repeated status calculations hit the compiled-statement cache"""
+        compiled = []
+
+        def _spy(conn, cursor, statement, parameters, context, executemany):
+            if statement.startswith("SELECT"):
+                compiled.append(context.compiled)
+
+        engine = db.get_bind().engine
+        event.listen(engine, "before_cursor_execute", _spy)
+        try:
+            for _ in range(2):
+                UnifiedStatusSyncService._calculate_correct_user_status(
+                    db, test_user.id)
+        finally:
+            event.remove(engine, "before_cursor_execute", _spy)
+
+        assert len(compiled) == 2
+        assert compiled[0] is compiled[1]
 
     def test_sync_user_status_on_transaction_change_no_change(self, db,
                                                               test_user,
-                                                              test_deposit_transaction):
+                                                              test_deposit_transaction,
+                                                              monkeypatch):
         """Test status sync when no change is needed"""
         # Mock user with correct status
-        with patch.object(test_user, 'user_withdrawal_status', "available"):
-            result = UnifiedStatusSyncService.sync_user_status_on_transaction_change(
-                db, test_deposit_transaction.id, "test"
-            )
+        monkeypatch.setattr(test_user, 'user_withdrawal_status', "available")
+        result = UnifiedStatusSyncService.sync_user_status_on_transaction_change(
+            db, test_deposit_transaction.id, "test"
+        )
 
-            assert result["changed"] is False
-            assert result["message"] == "Status is already correct"
+        assert result["changed"] is False
+        assert result["message"] == "Status is already correct"
 
     def test_sync_user_status_on_transaction_change_with_change(self, db,
-                                                                test_user):
+                                                                test_user,
+                                                                monkeypatch):
         """Test status sync when change is needed"""
         # Create a transaction that would change status
         transaction = Transaction(
@@ -98,38 +222,30 @@ class TestUnifiedStatusSyncService:
             transaction_purpose=TransactionPurposeEnum.regular
         )
         db.add(transaction)
-        db.commit()
+        db.flush()
 
         # Mock user with wrong status
-        with patch.object(test_user, 'user_withdrawal_status', "available"):
-            with patch.object(User, 'user_withdrawal_status',
-                              new="available") as mock_status:
-                result = UnifiedStatusSyncService.sync_user_status_on_transaction_change(
-                    db, transaction.id, "test"
-                )
-
-                assert result["changed"] is True
-                assert result["old_status"] == "available"
-                assert result["new_status"] == "regular_withdrawal_requested"
-
-    def test_deduct_balance_on_tax_completion_success(self, db, test_user):
+        monkeypatch.setattr(test_user, 'user_withdrawal_status', "available")
+        monkeypatch.setattr(User, 'user_withdrawal_status', "available")
+        result = UnifiedStatusSyncService.sync_user_status_on_transaction_change(
+            db, transaction.id, "test"
+        )
+
+        assert result["changed"] is True
+        assert result["old_status"] == "available"
+        assert result["new_status"] == "regular_withdrawal_requested"
+
+    def test_deduct_balance_on_tax_completion_success(self, db, test_user,
+                                                      insert_tax_payment):
         """Test successful balance deduction on tax completion"""
         # Create tax transaction
-        tax_transaction = Transaction(
-            user_id=test_user.id,
-            amount=50.0,
-            transaction_type=TransactionTypeEnum.withdrawal,
-            withdrawal_status=WithdrawalStatusEnum.completed,
-            transaction_purpose=TransactionPurposeEnum.tax_payment,
-            processed_at=datetime.utcnow()
-        )
-        db.add(tax_transaction)
+        insert_tax_payment(test_user.id, 50.0)
 
         # Set user balance
         balance = db.query(Balance).filter(
             Balance.user_id == test_user.id).first()
         balance.amount = 500.0
-        db.commit()
+        db.flush()
 
         result = UnifiedStatusSyncService._deduct_balance_on_tax_completion(db,
                                                                             test_user.id)
@@ -139,28 +255,19 @@ class TestUnifiedStatusSyncService:
         assert result["remaining_balance"] == 450.0
 
         # Verify balance was actually deducted
-        db.refresh(balance)
         assert balance.amount == 450.0
 
-    def test_deduct_balance_on_tax_completion_insufficient_balance(self, db,
-                                                                   test_user):
+    def test_deduct_balance_on_tax_completion_insufficient_balance(
+            self, db, test_user, insert_tax_payment):
         """Test tax deduction with insufficient balance"""
         # Create tax transaction
-        tax_transaction = Transaction(
-            user_id=test_user.id,
-            amount=100.0,
-            transaction_type=TransactionTypeEnum.withdrawal,
-            withdrawal_status=WithdrawalStatusEnum.completed,
-            transaction_purpose=TransactionPurposeEnum.tax_payment,
-            processed_at=datetime.utcnow()
-        )
-        db.add(tax_transaction)
+        insert_tax_payment(test_user.id, 100.0)
 
         # Set insufficient balance
         balance = db.query(Balance).filter(
             Balance.user_id == test_user.id).first()
         balance.amount = 50.0  # Less than tax amount
-        db.commit()
+        db.flush()
 
         result = UnifiedStatusSyncService._deduct_balance_on_tax_completion(db,
                                                                             test_user.id)
@@ -170,7 +277,7 @@ class TestUnifiedStatusSyncService:
         assert result["required"] == 100.0
         assert result["available"] == 50.0
 
-    def test_force_sync_user_status(self, db, test_user):
+    def test_force_sync_user_status(self, db, test_user, monkeypatch):
         """Test forcing user status synchronization"""
         # Create withdrawal that should change status
         transaction = Transaction(
@@ -181,19 +288,20 @@ class TestUnifiedStatusSyncService:
             transaction_purpose=TransactionPurposeEnum.regular
         )
         db.add(transaction)
-        db.commit()
+        db.flush()
 
         # Mock user with wrong status
-        with patch.object(test_user, 'user_withdrawal_status', "available"):
-            result = UnifiedStatusSyncService.force_sync_user_status(db,
-                                                                     test_user.id)
+        monkeypatch.setattr(test_user, 'user_withdrawal_status', "available")
+        result = UnifiedStatusSyncService.force_sync_user_status(db,
+                                                                 test_user.id)
 
-            assert result["changed"] is True
-            assert result["old_status"] == "available"
-            assert result["new_status"] == "regular_withdrawal_approved"
-            assert result["method"] == "force_sync"
+        assert result["changed"] is True
+        assert result["old_status"] == "available"
+        assert result["new_status"] == "regular_withdrawal_approved"
+        assert result["method"] == "force_sync"
 
-    def test_sync_all_users_status(self, db, test_user, admin_user):
+    def test_sync_all_users_status(self, db, test_user, admin_user,
+                                   monkeypatch):
         """Test mass synchronization of all user statuses"""
         # Create transactions that should change statuses
         user_transaction = Transaction(
@@ -212,107 +320,144 @@ class TestUnifiedStatusSyncService:
             transaction_purpose=TransactionPurposeEnum.regular
         )
 
-        db.add_all([user_transaction, admin_transaction])
-        db.commit()
+        # SAVEPOINT instead of a commit: the users loaded by the sync below
+        # come straight from the identity map
+        with db.begin_nested():
+            db.add_all([user_transaction, admin_transaction])
 
         # Mock users with wrong statuses
-        with patch.object(User, 'user_withdrawal_status', new="available"):
-            result = UnifiedStatusSyncService.sync_all_users_status(db)
+        monkeypatch.setattr(User, 'user_withdrawal_status', "available")
+        result = UnifiedStatusSyncService.sync_all_users_status(db)
 
-            assert result["total_users"] >= 2
-            assert result["changed_users"] >= 2
-            assert len(result["synced_users"]) >= 2
+        assert result["total_users"] >= 2
+        assert result["changed_users"] >= 2
+        assert len(result["synced_users"]) >= 2
 
 
+@pytest.mark.xdist_group("services_webhooks")
 class TestWebhookHandlers:
     """Test webhook handling service"""
 
-    @pytest.mark.asyncio
+    pytestmark = pytest.mark.asyncio
+
     async def test_handle_payment_webhook_success(self, db,
-                                                  test_withdrawal_transaction):
+                                                  make_webhook_request,
+                                                  background_tasks,
+                                                  test_withdrawal_transaction,
+                                                  sync_hook):
         """Test successful payment webhook handling"""
         # Mock request with success payload
-        mock_request = MagicMock()
-        mock_request.json = AsyncMock(return_value={
+        mock_request = make_webhook_request({
             "transaction_id": test_withdrawal_transaction.id,
             "status": "success",
             "payment_id": "pay_123"
         })
 
-        mock_background_tasks = MagicMock()
+        result = await WebhookHandlers.handle_payment_webhook(
+            mock_request, background_tasks, db
+        )
 
-        with patch(
-                'app.services.status_sync.hook_transaction_completed') as mock_sync:
-            mock_sync.return_value = {"changed": True}
+        assert result["status"] == "success"
+        assert result["transaction_id"] == test_withdrawal_transaction.id
+        assert "sync_result" in result
 
-            result = await WebhookHandlers.handle_payment_webhook(
-                mock_request, mock_background_tasks, db
-            )
+        # Verify transaction was updated
+        assert test_withdrawal_transaction.withdrawal_status == WithdrawalStatusEnum.completed
+        assert test_withdrawal_transaction.processed_at is not None
 
-            assert result["status"] == "success"
-            assert result["transaction_id"] == test_withdrawal_transaction.id
-            assert "sync_result" in result
+    async def test_handle_payment_webhook_idempotency_key(
+            self, db, make_webhook_request, background_tasks,
+            test_withdrawal_transaction, sync_hook, idempotency_cache):
+        """Test a repeated idempotency key returns the stored result"""
+        payload = {
+            "transaction_id": test_withdrawal_transaction.id,
+            "status": "success",
+            "idempotency_key": "unique_key_123"
+        }
 
-            # Verify transaction was updated
-            db.refresh(test_withdrawal_transaction)
-            assert test_withdrawal_transaction.withdrawal_status == WithdrawalStatusEnum.completed
-            assert test_withdrawal_transaction.processed_at is not None
+        first = await WebhookHandlers.handle_payment_webhook(
+            make_webhook_request(payload), background_tasks, db
+        )
+        second = await WebhookHandlers.handle_payment_webhook(
+            make_webhook_request(payload), background_tasks, db
+        )
+
+        assert second == first
+        assert second is not first
+        assert first["status"] == "success"
+        sync_hook.assert_called_once()
+        assert ("payment", test_withdrawal_transaction.id,
+                "unique_key_123") in idempotency_cache
+
+        # The same key on another transaction is not served the stored result
+        other = await WebhookHandlers.handle_payment_webhook(
+            make_webhook_request({**payload, "transaction_id": 999999}),
+            background_tasks, db
+        )
+        assert other == {"status": "error", "reason": "Transaction not found"}
+
+    async def test_idempotency_store_expires_results(self):
+        """Test a stored webhook result is dropped after its TTL"""
+        now = [1000.0]
+        store = InMemoryIdempotencyStore(max_size=2, ttl_seconds=30,
+                                         clock=lambda: now[0])
+        store.set(("payment", 1, "key"), {"status": "success"})
+
+        now[0] += 29
+        assert store.get(("payment", 1, "key")) == {"status": "success"}
+
+        now[0] += 1
+        assert store.get(("payment", 1, "key")) is None
+        assert not store
+
+    async def test_handle_payment_webhook_unhashable_idempotency_key(
+            self, db, make_webhook_request, background_tasks,
+            test_withdrawal_transaction, idempotency_cache):
+        """Test a list or object idempotency key is ignored, not a 500"""
+        result = await WebhookHandlers.handle_payment_webhook(
+            make_webhook_request({
+                "transaction_id": test_withdrawal_transaction.id,
+                "status": "failed",
+                "idempotency_key": {"nested": ["key"]}
+            }),
+            background_tasks, db
+        )
+
+        assert result["status"] == "processed"
+        assert not idempotency_cache
 
-    @pytest.mark.asyncio
     async def test_handle_payment_webhook_failure(self, db,
+                                                  make_webhook_request,
+                                                  background_tasks,
                                                   test_withdrawal_transaction):
         """Test failed payment webhook handling"""
-        mock_request = MagicMock()
-        mock_request.json = AsyncMock(return_value={
+        mock_request = make_webhook_request({
             "transaction_id": test_withdrawal_transaction.id,
             "status": "failed",
             "error_code": "DECLINED"
         })
 
-        mock_background_tasks = MagicMock()
-
         result = await WebhookHandlers.handle_payment_webhook(
-            mock_request, mock_background_tasks, db
+            mock_request, background_tasks, db
         )
 
         assert result["status"] == "processed"
         assert result["transaction_id"] == test_withdrawal_transaction.id
 
         # Verify transaction was marked as rejected
-        db.refresh(test_withdrawal_transaction)
         assert test_withdrawal_transaction.withdrawal_status == WithdrawalStatusEnum.rejected
 
-    @pytest.mark.asyncio
-    async def test_handle_payment_webhook_missing_transaction_id(self, db):
-        """Test payment webhook with missing transaction ID"""
-        mock_request = MagicMock()
-        mock_request.json = AsyncMock(return_value={
-            "status": "success"
-            # Missing transaction_id
-        })
-
-        mock_background_tasks = MagicMock()
-
-        result = await WebhookHandlers.handle_payment_webhook(
-            mock_request, mock_background_tasks, db
-        )
-
-        assert result["status"] == "error"
-        assert result["reason"] == "Missing transaction_id"
-
-    @pytest.mark.asyncio
     async def test_handle_blockchain_webhook_success(self, db,
+                                                     make_webhook_request,
+                                                     background_tasks,
                                                      test_deposit_transaction,
-                                                     monkeypatch):
+                                                     settings_override,
+                                                     sync_hook):
         """Test successful blockchain webhook handling"""
-        # Mock settings
-        from app.core import config
-        monkeypatch.setattr(config.settings, "current_confirmations_required",
-                            19)
-        monkeypatch.setattr(config.settings, "auto_complete_enabled", True)
-
-        mock_request = MagicMock()
-        mock_request.json = AsyncMock(return_value={
+        settings_override(current_confirmations_required=19,
+                          auto_complete_enabled=True)
+
+        mock_request = make_webhook_request({
             "event_type": "transaction_confirmed",
             "txid": "blockchain_tx_123",
             "confirmations": 20,
@@ -321,37 +466,28 @@ class TestWebhookHandlers:
             "token": "USDT"
         })
 
-        mock_background_tasks = MagicMock()
-
-        with patch(
-                'app.services.status_sync.hook_transaction_completed') as mock_sync:
-            mock_sync.return_value = {"changed": True}
-
-            result = await WebhookHandlers.handle_blockchain_webhook(
-                mock_request, mock_background_tasks, db
-            )
+        result = await WebhookHandlers.handle_blockchain_webhook(
+            mock_request, background_tasks, db
+        )
 
-            assert result["status"] == "auto_completed"
-            assert result["transaction_id"] == test_deposit_transaction.id
-            assert result["confirmations"] == 20
+        assert result["status"] == "auto_completed"
+        assert result["transaction_id"] == test_deposit_transaction.id
+        assert result["confirmations"] == 20
 
-            # Verify transaction was updated
-            db.refresh(test_deposit_transaction)
-            assert test_deposit_transaction.withdrawal_status == WithdrawalStatusEnum.completed
-            assert test_deposit_transaction.txid == "blockchain_tx_123"
+        # Verify transaction was updated
+        assert test_deposit_transaction.withdrawal_status == WithdrawalStatusEnum.completed
+        assert test_deposit_transaction.txid == "blockchain_tx_123"
 
-    @pytest.mark.asyncio
     async def test_handle_blockchain_webhook_insufficient_confirmations(self,
                                                                         db,
+                                                                        make_webhook_request,
+                                                                        background_tasks,
                                                                         test_deposit_transaction,
-                                                                        monkeypatch):
+                                                                        settings_override):
         """Test blockchain webhook with insufficient confirmations"""
-        from app.core import config
-        monkeypatch.setattr(config.settings, "current_confirmations_required",
-                            19)
+        settings_override(current_confirmations_required=19)
 
-        mock_request = MagicMock()
-        mock_request.json = AsyncMock(return_value={
+        mock_request = make_webhook_request({
             "event_type": "transaction_confirmed",
             "txid": "blockchain_tx_123",
             "confirmations": 15,  # Less than required
@@ -360,10 +496,8 @@ class TestWebhookHandlers:
             "token": "USDT"
         })
 
-        mock_background_tasks = MagicMock()
-
         result = await WebhookHandlers.handle_blockchain_webhook(
-            mock_request, mock_background_tasks, db
+            mock_request, background_tasks, db
         )
 
         assert result["status"] == "pending"
@@ -371,85 +505,180 @@ class TestWebhookHandlers:
         assert result["required_confirmations"] == 19
 
         # Verify transaction was NOT updated
-        db.refresh(test_deposit_transaction)
         assert test_deposit_transaction.withdrawal_status == WithdrawalStatusEnum.pending
         assert test_deposit_transaction.txid is None
 
-    @pytest.mark.asyncio
-    async def test_handle_blockchain_webhook_no_matching_transaction(self, db,
-                                                                     monkeypatch):
-        """Test blockchain webhook with no matching transaction"""
-        from app.core import config
-        monkeypatch.setattr(config.settings, "current_confirmations_required",
-                            19)
+    @pytest.mark.parametrize("handler,settings_overrides,payload,expected", [
+        pytest.param(
+            "handle_payment_webhook", {},
+            {"status": "success"},  # Missing transaction_id
+            {"status": "error", "reason": "Missing transaction_id"},
+            id="payment_missing_transaction_id"),
+        pytest.param(
+            "handle_blockchain_webhook",
+            {"current_confirmations_required": 19},
+            {
+                "event_type": "transaction_confirmed",
+                "txid": "blockchain_tx_123",
+                "confirmations": 20,
+                "address": "TNonExistent123456789012345678901",
+                "amount": 999.99,
+                "token": "USDT"
+            },
+            {
+                "status": "no_match",
+                "address": "TNonExistent123456789012345678901",
+                "amount": 999.99
+            },
+            id="blockchain_no_matching_transaction"),
+        pytest.param(
+            "handle_blockchain_webhook", {},
+            {"event_type": "balance_updated", "txid": "blockchain_tx_123"},
+            {
+                "status": "ignored",
+                "reason": "Unsupported event type: balance_updated"
+            },
+            id="blockchain_wrong_event_type"),
+        pytest.param(
+            "handle_blockchain_webhook",
+            {"current_confirmations_required": 19},
+            {
+                "event_type": "transaction_confirmed",
+                "txid": "blockchain_tx_123",
+                "confirmations": 20,
+                "address": ["TNonExistent123456789012345678901"],
+                "amount": 999.99
+            },
+            {
+                "status": "error",
+                "reason": "Invalid address, amount or txid"
+            },
+            id="blockchain_invalid_address"),
+    ])
+    async def test_handle_webhook_without_update(self, db,
+                                                 make_webhook_request,
+                                                 background_tasks,
+                                                 settings_override, handler,
+                                                 settings_overrides, payload,
+                                                 expected):
+        """Test webhooks that are answered without touching a transaction"""
+        settings_override(**settings_overrides)
+
+        result = await getattr(WebhookHandlers, handler)(
+            make_webhook_request(payload), background_tasks, db
+        )
 
-        mock_request = MagicMock()
-        mock_request.json = AsyncMock(return_value={
+        assert expected.items() <= result.items()
+
+    async def test_handle_blockchain_webhook_batch(self, db,
+                                                   make_webhook_request,
+                                                   background_tasks,
+                                                   test_deposit_transaction,
+                                                   batch_sync_hook):
+        """Test a webhook batch confirms each pending deposit only once"""
+        event = {
             "event_type": "transaction_confirmed",
             "txid": "blockchain_tx_123",
             "confirmations": 20,
-            "address": "TNonExistent123456789012345678901",
-            "amount": 999.99,
+            "address": test_deposit_transaction.wallet_address,
+            "amount": test_deposit_transaction.amount,
             "token": "USDT"
-        })
+        }
+        mock_request = make_webhook_request(
+            [event, event, {**event, "confirmations": 5}])
 
-        mock_background_tasks = MagicMock()
+        result = await WebhookHandlers.handle_blockchain_webhook_batch(
+            mock_request, background_tasks, db
+        )
 
-        result = await WebhookHandlers.handle_blockchain_webhook(
-            mock_request, mock_background_tasks, db
+        assert result["processed"] == 3
+        assert result["completed"] == 1
+        assert [item["status"] for item in result["results"]] == [
+            "auto_completed", "no_match", "pending"]
+        assert result["results"][0]["transaction_id"] == \
+            test_deposit_transaction.id
+        assert result["results"][0]["auto_sync_result"] == {
+            "transaction_id": test_deposit_transaction.id, **_SYNC_RESULT}
+        # One status sync for the whole batch, not one per event
+        batch_sync_hook.assert_called_once_with(
+            db, [test_deposit_transaction.id], "blockchain_webhook")
+
+        assert test_deposit_transaction.withdrawal_status == WithdrawalStatusEnum.completed
+        assert test_deposit_transaction.txid == "blockchain_tx_123"
+
+    async def test_handle_blockchain_webhook_batch_malformed_events(
+            self, db, make_webhook_request, background_tasks,
+            test_deposit_transaction, batch_sync_hook):
+        """Test malformed events get their own error, not a failed batch"""
+        event = {
+            "event_type": "transaction_confirmed",
+            "txid": "blockchain_tx_123",
+            "confirmations": 20,
+            "address": test_deposit_transaction.wallet_address,
+            "amount": test_deposit_transaction.amount,
+            "token": "USDT"
+        }
+        mock_request = make_webhook_request([
+            "not an event",
+            {**event, "address": ["unhashable"]},
+            {**event, "amount": {"value": 100}},
+            {**event, "confirmations": "20"},
+            event
+        ])
+
+        result = await WebhookHandlers.handle_blockchain_webhook_batch(
+            mock_request, background_tasks, db
         )
 
-        assert result["status"] == "no_match"
-        assert result["address"] == "TNonExistent123456789012345678901"
-        assert result["amount"] == 999.99
-
-    @pytest.mark.asyncio
-    async def test_handle_blockchain_webhook_wrong_event_type(self, db):
-        """Test blockchain webhook with unsupported event type"""
-        mock_request = MagicMock()
-        mock_request.json = AsyncMock(return_value={
-            "event_type": "balance_updated",
-            "txid": "blockchain_tx_123"
-        })
+        assert [item["status"] for item in result["results"]] == [
+            "error", "error", "error", "error", "auto_completed"]
+        assert result["completed"] == 1
+        assert test_deposit_transaction.withdrawal_status == WithdrawalStatusEnum.completed
+
+    async def test_handle_blockchain_webhook_batch_rejects_non_array(
+            self, db, make_webhook_request, background_tasks):
+        """Test a batch body that is not a JSON array is a 400"""
+        with pytest.raises(HTTPException) as exc_info:
+            await WebhookHandlers.handle_blockchain_webhook_batch(
+                make_webhook_request({"event_type": "transaction_confirmed"}),
+                background_tasks, db
+            )
 
-        mock_background_tasks = MagicMock()
+        assert exc_info.value.status_code == 400
 
-        result = await WebhookHandlers.handle_blockchain_webhook(
-            mock_request, mock_background_tasks, db
-        )
+    async def test_handle_blockchain_webhook_batch_malformed_json(
+            self, db, background_tasks):
+        """Test an undecodable batch body goes through the error mapping"""
+        async def _body():
+            return b"[{not json"
 
-        assert result["status"] == "ignored"
-        assert "Unsupported event type" in result["reason"]
+        with pytest.raises(HTTPException) as exc_info:
+            await WebhookHandlers.handle_blockchain_webhook_batch(
+                SimpleNamespace(body=_body), background_tasks, db
+            )
 
+        assert exc_info.value.status_code == 500
 
+
+@pytest.mark.xdist_group("services_integration")
 class TestServiceIntegration:
     """Integration tests for service interactions"""
 
     def test_webhook_triggers_status_sync(self, db,
                                           test_withdrawal_transaction):
         """Test that webhook processing triggers status synchronization"""
-        # Mock webhook success that should trigger status sync
-        with patch(
-                'app.services.status_sync.hook_transaction_completed') as mock_sync:
-            mock_sync.return_value = {
-                "user_id": test_withdrawal_transaction.user_id,
-                "changed": True,
-                "old_status": "withdrawal_in_progress",
-                "new_status": "available"
-            }
-
-            # Simulate webhook completion
-            test_withdrawal_transaction.withdrawal_status = WithdrawalStatusEnum.completed
-            test_withdrawal_transaction.processed_at = datetime.utcnow()
-            db.commit()
+        # Simulate webhook completion
+        test_withdrawal_transaction.withdrawal_status = WithdrawalStatusEnum.completed
+        test_withdrawal_transaction.processed_at = _FIXED_NOW
+        db.flush()
 
-            # Trigger sync
-            result = UnifiedStatusSyncService.sync_user_status_on_transaction_change(
-                db, test_withdrawal_transaction.id, "webhook_test"
-            )
+        # Trigger sync
+        result = UnifiedStatusSyncService.sync_user_status_on_transaction_change(
+            db, test_withdrawal_transaction.id, "webhook_test"
+        )
 
-            assert result["changed"] is True
-            assert result["source"] == "webhook_test"
+        assert result["changed"] is True
+        assert result["source"] == "webhook_test"
 
     def test_tax_payment_triggers_balance_deduction(self, db, test_user):
         """Test that tax payment completion triggers balance deduction"""
@@ -457,7 +686,7 @@ class TestServiceIntegration:
         balance = db.query(Balance).filter(
             Balance.user_id == test_user.id).first()
         balance.amount = 1000.0
-        db.commit()
+        db.flush()
 
         # Create and complete tax payment
         tax_transaction = Transaction(
@@ -466,10 +695,10 @@ class TestServiceIntegration:
             transaction_type=TransactionTypeEnum.withdrawal,
             withdrawal_status=WithdrawalStatusEnum.completed,
             transaction_purpose=TransactionPurposeEnum.tax_payment,
-            processed_at=datetime.utcnow()
+            processed_at=_FIXED_NOW
         )
         db.add(tax_transaction)
-        db.commit()
+        db.flush()
 
         # Trigger status sync (should include balance deduction)
         result = UnifiedStatusSyncService.sync_user_status_on_transaction_change(
@@ -481,37 +710,96 @@ class TestServiceIntegration:
         assert result["balance_deduction"]["deducted_amount"] == 100.0
 
         # Verify balance was deducted
-        db.refresh(balance)
         assert balance.amount == 900.0
 
     def test_concurrent_status_sync(self, db, test_user):
         """Test concurrent status synchronization operations"""
         # Create multiple transactions
-        transactions = []
-        for i in range(3):
-            tx = Transaction(
+        transactions = [
+            Transaction(
                 user_id=test_user.id,
                 amount=50.0 + i * 10,
                 transaction_type=TransactionTypeEnum.withdrawal,
                 withdrawal_status=WithdrawalStatusEnum.requested,
                 transaction_purpose=TransactionPurposeEnum.regular
             )
-            db.add(tx)
-            transactions.append(tx)
-        db.commit()
-
-        # Simulate concurrent sync operations
-        results = []
-        for tx in transactions:
-            result = UnifiedStatusSyncService.sync_user_status_on_transaction_change(
-                db, tx.id, f"concurrent_test_{tx.id}"
-            )
-            results.append(result)
+            for i in range(3)
+        ]
+        db.add_all(transactions)
+        db.flush()
+
+        # Sync all of them in one batch
+        result = UnifiedStatusSyncService.sync_user_status_on_transactions_batch(
+            db, [tx.id for tx in transactions], "concurrent_test"
+        )
+
+        # Each transaction gets a consistent result; the user is synced once
+        assert len(result["results"]) == 3
+        assert result["synced_users"] == 1
+        for tx, tx_result in zip(transactions, result["results"]):
+            assert "error" not in tx_result
+            assert tx_result["transaction_id"] == tx.id
+            assert tx_result["user_id"] == test_user.id
+            assert tx_result["new_status"] == "regular_withdrawal_requested"
+            assert tx_result["source"] == "concurrent_test"
+
+    def test_batch_status_sync_uses_one_query_and_update(self, db,
+                                                          perf_users):
+        """Test a batch sync reads statuses once and writes them once"""
+        transaction_ids = db.scalars(select(Transaction.id).where(
+            Transaction.user_id.in_(perf_users))).all()
+        statements = []
+
+        def _spy(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement.split(None, 1)[0])
+
+        engine = db.get_bind().engine
+        event.listen(engine, "before_cursor_execute", _spy)
+        try:
+            result = UnifiedStatusSyncService.sync_user_status_on_transactions_batch(
+                db, transaction_ids, "batch_test")
+        finally:
+            event.remove(engine, "before_cursor_execute", _spy)
+
+        # Transactions, users' current statuses, active withdrawals
+        assert statements.count("SELECT") == 3
+        assert statements.count("UPDATE") == 1
+        assert result["changed_users"] == 10
+
+        # Users are already in sync now; results keep the single-sync shape
+        result = UnifiedStatusSyncService.sync_user_status_on_transactions_batch(
+            db, transaction_ids[:1], "batch_test")
+        assert result["changed_users"] == 0
+        assert result["results"][0]["changed"] is False
+        assert result["results"][0]["current_status"] == \
+            "regular_withdrawal_requested"
+
+    def test_batch_status_sync_commits_tax_deduction_once(
+            self, db, test_user, insert_tax_payment, monkeypatch):
+        """Test tax deductions in a batch are committed with the statuses"""
+        insert_tax_payment(test_user.id, 100.0)
+        tax_id = db.scalars(select(Transaction.id).where(
+            Transaction.user_id == test_user.id)).one()
+        db.add(Transaction(
+            user_id=test_user.id,
+            amount=50.0,
+            transaction_type=TransactionTypeEnum.withdrawal,
+            withdrawal_status=WithdrawalStatusEnum.requested,
+            transaction_purpose=TransactionPurposeEnum.regular
+        ))
+        db.flush()
+
+        commit = Mock(wraps=db.commit)
+        monkeypatch.setattr(db, "commit", commit)
+        result = UnifiedStatusSyncService.sync_user_status_on_transactions_batch(
+            db, [tax_id], "tax_batch")
 
-        # All should succeed and produce consistent results
-        for result in results:
-            assert "error" not in result
-            assert result["user_id"] == test_user.id
+        commit.assert_called_once()
+        tx_result = result["results"][0]
+        assert tx_result["balance_deduction"]["deducted_amount"] == 100.0
+        assert tx_result["new_status"] == "regular_withdrawal_requested"
+        assert db.scalars(select(Balance.amount).where(
+            Balance.user_id == test_user.id)).one() == 900.0
 
     def test_service_error_handling(self, db):
         """Test service error handling with invalid data"""
@@ -529,75 +817,41 @@ class TestServiceIntegration:
             UnifiedStatusSyncService.force_sync_user_status(db, 999999)
 
 
+@pytest.mark.xdist_group("services_performance")
 class TestServicePerformance:
     """Test service performance and optimization"""
 
-    def test_bulk_status_sync_performance(self, db):
-        """Test performance of bulk status synchronization"""
-        import time
-
-        # Create multiple users with transactions
-        users = []
-        for i in range(10):
-            user = User(
-                username=f"perf_user_{i}",
-                password_hash="dummy_hash",
-                email=f"perf_{i}@example.com",
-                is_active=True
-            )
-            db.add(user)
-            users.append(user)
-
-        db.commit()
-
-        # Create transactions for each user
-        for user in users:
-            balance = Balance(user_id=user.id, amount=1000.0)
-            db.add(balance)
-
-            tx = Transaction(
-                user_id=user.id,
-                amount=100.0,
-                transaction_type=TransactionTypeEnum.withdrawal,
-                withdrawal_status=WithdrawalStatusEnum.requested,
-                transaction_purpose=TransactionPurposeEnum.regular
-            )
-            db.add(tx)
-
-        db.commit()
-
-        # Time bulk sync operation
-        start_time = time.time()
+    def test_bulk_status_sync(self, db, perf_users):
+        """Test bulk status synchronization over many users"""
         result = UnifiedStatusSyncService.sync_all_users_status(db)
-        end_time = time.time()
 
-        # Should complete reasonably quickly (< 1 second for 10 users)
-        assert (end_time - start_time) < 1.0
         assert result["total_users"] >= 10
         assert result["changed_users"] >= 10
 
-    def test_individual_sync_performance(self, db, test_user):
-        """Test performance of individual status synchronization"""
-        import time
-
-        # Create transaction
-        transaction = Transaction(
-            user_id=test_user.id,
-            amount=100.0,
-            transaction_type=TransactionTypeEnum.withdrawal,
-            withdrawal_status=WithdrawalStatusEnum.approved,
-            transaction_purpose=TransactionPurposeEnum.regular
+    def test_individual_sync(self, db, approved_withdrawal):
+        """Test individual status synchronization"""
+        result = UnifiedStatusSyncService.sync_user_status_on_transaction_change(
+            db, approved_withdrawal.id, "performance_test"
         )
-        db.add(transaction)
-        db.commit()
 
-        # Time individual sync
-        start_time = time.time()
-        result = UnifiedStatusSyncService.sync_user_status_on_transaction_change(
-            db, transaction.id, "performance_test"
+        assert "error" not in result
+
+    @requires_benchmark
+    def test_bulk_status_sync_performance(self, db, perf_users, benchmark):
+        """Benchmark bulk status synchronization over many users"""
+        result = benchmark(UnifiedStatusSyncService.sync_all_users_status, db)
+        benchmark.extra_info["n_users"] = result["total_users"]
+
+        assert result["total_users"] >= 10
+
+    @requires_benchmark
+    def test_individual_sync_performance(self, db, approved_withdrawal,
+                                         benchmark):
+        """Benchmark individual status synchronization"""
+        result = benchmark(
+            UnifiedStatusSyncService.sync_user_status_on_transaction_change,
+            db, approved_withdrawal.id, "performance_test"
         )
-        end_time = time.time()
+        benchmark.extra_info["n_users"] = 1
 
-        # Should complete very quickly (< 0.1 seconds)
-        assert (end_time - start_time) < 0.1
-        assert "error" not in result
\ No newline at end of file
+        assert "error" not in result
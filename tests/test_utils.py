@@ -1,94 +1,190 @@
 # tests/test_utils.py
 
+import os
+import time
+import logging
 import pytest
-import json
-from typing import Dict, Any, List
+import itertools
+from typing import Dict, Any, List, Mapping, Sequence
+from contextlib import contextmanager
+from functools import lru_cache
 from datetime import datetime, timedelta
+from types import MappingProxyType, SimpleNamespace
 from unittest.mock import MagicMock
+from sqlalchemy import func, insert, select
 from app.models.user import User, Balance
 from app.models.transaction import Transaction, TransactionTypeEnum, \
     WithdrawalStatusEnum
 from app.models.wallet import WalletAddress, AddressStatusEnum
-from app.core.core_auth import create_access_token, get_password_hash
+from app.core.core_auth import get_password_hash
+from tests.helpers import bearer_headers, headers_for, token_for
+
+
+logger = logging.getLogger(__name__)
+
+# Unique suffixes for generated addresses and ids; wall-clock seconds
+# collide when two are made within the same second
+_id_seq = itertools.count(1)
+
+
+# Base58 digits used by TRON addresses: no 0, O, I or l
+_BASE58_ALPHABET = "123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz"
+
+
+def _base58_suffix(n: int, width: int) -> str:
+    """n in base58, left-padded with the zero digit "1" to width"""
+    digits = []
+    while n:
+        n, rem = divmod(n, 58)
+        digits.append(_BASE58_ALPHABET[rem])
+    return "".join(reversed(digits)).rjust(width, "1")
+
+
+# ISO timestamp from TEST_FROZEN_TIME, parsed once per distinct value
+_parse_frozen_time = lru_cache(maxsize=None)(datetime.fromisoformat)
+
+
+@lru_cache(maxsize=None)
+def cached_password_hash(password: str) -> str:
+    """Hash each distinct test password only once per session"""
+    return get_password_hash(password)
+
+
+# Read-only column defaults for the factories, merged with per-call values
+_USER_DEFAULTS = MappingProxyType({
+    "is_active": True,
+    "is_admin": False
+})
+
+_WALLET_DEFAULTS = MappingProxyType({
+    "status": AddressStatusEnum.active,
+    "is_active": True,
+    "usage_count": 0
+})
+
+_TX_DEFAULTS = MappingProxyType({
+    "amount": 100.0,
+    "transaction_type": TransactionTypeEnum.deposit,
+    "withdrawal_status": WithdrawalStatusEnum.pending,
+    "payment_method": "USDT (TRC20)",
+    "wallet_address": "TTest1234567890123456789012345678",
+    "comment": "Test transaction"
+})
+
+_BATCH_KEY = "test_data_factory_batch"
+
+
+def _commit(db):
+    """Commit, or only flush inside TestDataFactory.batch()"""
+    if db.info.get(_BATCH_KEY):
+        db.flush()
+    else:
+        db.commit()
 
 
 class TestDataFactory:
     """Factory for creating test data"""
 
     @staticmethod
-    def create_test_user(db, username: str = "testuser", **kwargs) -> User:
-        """Create a test user with default values"""
-        defaults = {
+    @contextmanager
+    def batch(db):
+        """Flush instead of commit in the factories; commit once on exit"""
+        outer = db.info.get(_BATCH_KEY, False)
+        db.info[_BATCH_KEY] = True
+        try:
+            yield
+        finally:
+            db.info[_BATCH_KEY] = outer
+        if not outer:
+            db.commit()
+
+    @staticmethod
+    def create_test_user(db, username: str = "testuser",
+                         password: str = "testpass123", *,
+                         refresh: bool = False, **kwargs) -> User:
+        """Create a test user; refresh=True reloads the row"""
+        if "password_hash" not in kwargs:
+            kwargs["password_hash"] = cached_password_hash(password)
+        user = User(**{
+            **_USER_DEFAULTS,
             "username": username,
-            "password_hash": get_password_hash("testpass123"),
             "email": f"{username}@example.com",
             "full_name": f"Test {username.title()}",
-            "is_active": True,
-            "is_admin": False
-        }
-        defaults.update(kwargs)
-
-        user = User(**defaults)
+            **kwargs
+        })
         db.add(user)
-        db.commit()
-        db.refresh(user)
+        _commit(db)
+        if refresh:
+            db.refresh(user)
         return user
 
     @staticmethod
-    def create_test_admin(db, username: str = "testadmin", **kwargs) -> User:
+    def create_test_admin(db, username: str = "testadmin",
+                          password: str = "testadminpass123",
+                          **kwargs) -> User:
         """Create a test admin user"""
         kwargs.setdefault("is_admin", True)
-        return TestDataFactory.create_test_user(db, username, **kwargs)
+        return TestDataFactory.create_test_user(db, username, password,
+                                                **kwargs)
 
     @staticmethod
     def create_test_balance(db, user: User, amount: float = 1000.0) -> Balance:
         """Create a test balance for user"""
         balance = Balance(user_id=user.id, amount=amount)
         db.add(balance)
-        db.commit()
-        db.refresh(balance)
+        _commit(db)
         return balance
 
     @staticmethod
-    def create_test_wallet_address(db, address: str = None,
+    def bulk_create_balances(db, users: List[User],
+                             amount: float = 1000.0) -> None:
+        """Create a balance for each user in one INSERT"""
+        db.execute(insert(Balance),
+                   [{"user_id": user.id, "amount": amount} for user in users])
+        _commit(db)
+
+    @staticmethod
+    def create_test_wallet_address(db, address: str = None, *,
+                                   refresh: bool = False,
                                    **kwargs) -> WalletAddress:
-        """Create a test wallet address"""
+        """Create a test wallet address; refresh=True reloads the row"""
         if address is None:
-            address = f"TTest{datetime.now().strftime('%Y%m%d%H%M%S')}"
-            address = address[:34].ljust(34, '0')
-
-        defaults = {
-            "address": address,
-            "status": AddressStatusEnum.active,
-            "is_active": True,
-            "usage_count": 0
-        }
-        defaults.update(kwargs)
+            address = "TTest" + _base58_suffix(next(_id_seq), 29)
 
-        wallet = WalletAddress(**defaults)
+        wallet = WalletAddress(**{**_WALLET_DEFAULTS, "address": address,
+                                  **kwargs})
         db.add(wallet)
-        db.commit()
-        db.refresh(wallet)
+        _commit(db)
+        if refresh:
+            db.refresh(wallet)
         return wallet
 
     @staticmethod
-    def create_test_transaction(db, user: User, **kwargs) -> Transaction:
-        """Create a test transaction"""
-        defaults = {
-            "user_id": user.id,
-            "amount": 100.0,
-            "transaction_type": TransactionTypeEnum.deposit,
-            "withdrawal_status": WithdrawalStatusEnum.pending,
-            "payment_method": "USDT (TRC20)",
-            "wallet_address": "TTest1234567890123456789012345678",
-            "comment": "Test transaction"
-        }
-        defaults.update(kwargs)
+    def bulk_create_wallet_addresses(db, addresses: Sequence[str] = None,
+                                     **kwargs) -> List[int]:
+        """Create many wallet addresses in one INSERT and return their ids"""
+        if addresses is None:
+            addresses = TEST_ADDRESSES
+
+        defaults = {**_WALLET_DEFAULTS, **kwargs}
+        ids = db.scalars(
+            insert(WalletAddress).returning(WalletAddress.id,
+                                            sort_by_parameter_order=True),
+            [{**defaults, "address": address} for address in addresses]
+        ).all()
+        _commit(db)
+        return ids
 
-        transaction = Transaction(**defaults)
+    @staticmethod
+    def create_test_transaction(db, user: User, *, refresh: bool = False,
+                                **kwargs) -> Transaction:
+        """Create a test transaction; refresh=True reloads the row"""
+        transaction = Transaction(**{**_TX_DEFAULTS, "user_id": user.id,
+                                     **kwargs})
         db.add(transaction)
-        db.commit()
-        db.refresh(transaction)
+        _commit(db)
+        if refresh:
+            db.refresh(transaction)
         return transaction
 
     @staticmethod
@@ -119,10 +215,15 @@ class TestAuthHelper:
     """Helper for authentication in tests"""
 
     @staticmethod
-    def create_auth_headers(user: User) -> Dict[str, str]:
-        """Create authorization headers for user"""
-        token = create_access_token(data={"sub": str(user.id)})
-        return {"Authorization": f"Bearer {token}"}
+    def create_auth_headers(user: User) -> Mapping[str, str]:
+        """Read-only authorization headers; merge with {**headers, ...}"""
+        return headers_for(user.id)
+
+    @staticmethod
+    def clear_token_cache():
+        """Forget cached tokens, e.g. after a test rotates the secret"""
+        bearer_headers.cache_clear()
+        token_for.cache_clear()
 
     @staticmethod
     def login_user(client, username: str, password: str) -> str:
@@ -161,8 +262,8 @@ class TestWebhookHelper:
         payload = {
             "transaction_id": transaction_id,
             "status": status,
-            "payment_id": f"pay_{transaction_id}_{datetime.now().strftime('%Y%m%d%H%M%S')}",
-            "timestamp": int(datetime.utcnow().timestamp())
+            "payment_id": f"pay_{transaction_id}_{next(_id_seq)}",
+            "timestamp": int(TestTimeHelper.frozen_now().timestamp())
         }
         payload.update(kwargs)
         return payload
@@ -174,13 +275,13 @@ class TestWebhookHelper:
         """Create blockchain webhook payload"""
         payload = {
             "event_type": "transaction_confirmed",
-            "txid": f"blockchain_tx_{datetime.now().strftime('%Y%m%d%H%M%S')}",
+            "txid": f"blockchain_tx_{next(_id_seq)}",
             "confirmations": confirmations,
             "address": address,
             "amount": amount,
             "token": "USDT",
             "block_height": 12345678,
-            "timestamp": int(datetime.utcnow().timestamp())
+            "timestamp": int(TestTimeHelper.frozen_now().timestamp())
         }
         payload.update(kwargs)
         return payload
@@ -203,6 +304,12 @@ class TestAssertions:
         assert abs(balance.amount - expected_amount) <= tolerance, \
             f"Expected balance {expected_amount}, got {balance.amount}"
 
+    @staticmethod
+    def assert_balances_close(actual: List[float], expected: List[float],
+                              tolerance: float = 0.001):
+        """Assert many balance amounts at once, reporting every mismatch"""
+        assert list(actual) == pytest.approx(list(expected), abs=tolerance)
+
     @staticmethod
     def assert_response_success(response, expected_operation: str = None):
         """Assert API response is successful"""
@@ -229,24 +336,35 @@ class TestAssertions:
         if expected_count is not None:
             assert len(transactions) == expected_count
 
-        if expected_type:
-            for tx in transactions:
-                assert tx.get("type") == expected_type or tx.get(
-                    "transaction_type") == expected_type
+        if expected_type and transactions:
+            # One response uses one shape, so probe the key once
+            key = "type" if "type" in transactions[0] else "transaction_type"
+            bad = next((i for i, tx in enumerate(transactions)
+                        if tx.get(key) != expected_type), None)
+            assert bad is None, \
+                f"Transaction {bad} has {key} {transactions[bad].get(key)!r}, expected {expected_type!r}"
 
 
 class TestTimeHelper:
     """Helper for time-related testing"""
 
+    @staticmethod
+    def frozen_now() -> datetime:
+        """Current UTC time, or the fixed TEST_FROZEN_TIME when it is set"""
+        frozen = os.environ.get("TEST_FROZEN_TIME")
+        if frozen:
+            return _parse_frozen_time(frozen)
+        return datetime.utcnow()
+
     @staticmethod
     def create_expired_datetime(minutes_ago: int = 30) -> datetime:
         """Create datetime that is expired"""
-        return datetime.utcnow() - timedelta(minutes=minutes_ago)
+        return TestTimeHelper.frozen_now() - timedelta(minutes=minutes_ago)
 
     @staticmethod
     def create_future_datetime(minutes_ahead: int = 30) -> datetime:
         """Create future datetime"""
-        return datetime.utcnow() + timedelta(minutes=minutes_ahead)
+        return TestTimeHelper.frozen_now() + timedelta(minutes=minutes_ahead)
 
     @staticmethod
     def assert_datetime_recent(dt: datetime, tolerance_seconds: int = 60):
@@ -256,28 +374,46 @@ class TestTimeHelper:
         assert diff <= tolerance_seconds, f"Datetime {dt} is not recent (diff: {diff}s)"
 
 
+# Canned AddressPoolService results, shared read-only by the pool mocks
+_POOL_STATUS = MappingProxyType({
+    "total_addresses": 50,
+    "active_addresses": 45,
+    "reserved_addresses": 3,
+    "inactive_addresses": 2,
+    "pool_health": "healthy"
+})
+
+_ADD_RESULT = MappingProxyType({
+    "added_count": 10,
+    "skipped_count": 0,
+    "total_addresses": 60
+})
+
+
 class MockService:
     """Mocks for external services"""
 
     @staticmethod
     def mock_address_pool_service():
-        """Create mock for AddressPoolService"""
+        """Create a plain stub for AddressPoolService with fixed results"""
+        return SimpleNamespace(
+            get_available_address_with_retry=lambda *args, **kwargs: None,
+            assign_address_to_transaction_atomic=lambda *args, **kwargs: True,
+            release_address_atomic=lambda *args, **kwargs: True,
+            get_pool_status=lambda *args, **kwargs: _POOL_STATUS,
+            add_addresses_to_pool_atomic=lambda *args, **kwargs: _ADD_RESULT,
+            cleanup_expired_reservations=lambda *args, **kwargs: 5
+        )
+
+    @staticmethod
+    def recording_address_pool_service():
+        """Create a MagicMock AddressPoolService for asserting on calls"""
         mock = MagicMock()
         mock.get_available_address_with_retry.return_value = None
         mock.assign_address_to_transaction_atomic.return_value = True
         mock.release_address_atomic.return_value = True
-        mock.get_pool_status.return_value = {
-            "total_addresses": 50,
-            "active_addresses": 45,
-            "reserved_addresses": 3,
-            "inactive_addresses": 2,
-            "pool_health": "healthy"
-        }
-        mock.add_addresses_to_pool_atomic.return_value = {
-            "added_count": 10,
-            "skipped_count": 0,
-            "total_addresses": 60
-        }
+        mock.get_pool_status.return_value = _POOL_STATUS
+        mock.add_addresses_to_pool_atomic.return_value = _ADD_RESULT
         mock.cleanup_expired_reservations.return_value = 5
         return mock
 
@@ -301,7 +437,7 @@ class MockService:
                 {
                     "transaction_id": "mock_tx_123",
                     "block_timestamp": int(
-                        datetime.utcnow().timestamp() * 1000),
+                        TestTimeHelper.frozen_now().timestamp() * 1000),
                     "from": "TSender123456789012345678901234",
                     "to": "TReceiver12345678901234567890123",
                     "value": "100000000",  # 100 USDT
@@ -313,45 +449,24 @@ class MockService:
 
 
 class DatabaseHelper:
-    """Helper for database operations in tests"""
-
-    @staticmethod
-    def clear_all_transactions(db):
-        """Clear all transactions from database"""
-        db.query(Transaction).delete()
-        db.commit()
-
-    @staticmethod
-    def clear_all_users(db):
-        """Clear all users and related data"""
-        db.query(Balance).delete()
-        db.query(Transaction).delete()
-        db.query(User).delete()
-        db.commit()
-
-    @staticmethod
-    def clear_all_addresses(db):
-        """Clear all wallet addresses"""
-        from app.models.wallet import AddressReservation
-        db.query(AddressReservation).delete()
-        db.query(WalletAddress).delete()
-        db.commit()
+    """Helper for database reads in tests; the db fixture rolls back writes"""
 
     @staticmethod
     def get_transaction_count(db,
                               transaction_type: TransactionTypeEnum = None) -> int:
         """Get count of transactions by type"""
-        query = db.query(Transaction)
+        stmt = select(func.count()).select_from(Transaction)
         if transaction_type:
-            query = query.filter(
+            stmt = stmt.where(
                 Transaction.transaction_type == transaction_type)
-        return query.count()
+        return db.scalar(stmt)
 
     @staticmethod
     def get_user_balance(db, user_id: int) -> float:
         """Get user balance amount"""
-        balance = db.query(Balance).filter(Balance.user_id == user_id).first()
-        return balance.amount if balance else 0.0
+        amount = db.scalar(select(Balance.amount).where(
+            Balance.user_id == user_id).limit(1))
+        return amount if amount is not None else 0.0
 
 
 class PerformanceHelper:
@@ -360,13 +475,11 @@ class PerformanceHelper:
     @staticmethod
     def measure_time(func):
         """Decorator to measure function execution time"""
-        import time
-
         def wrapper(*args, **kwargs):
-            start = time.time()
+            start = time.perf_counter_ns()
             result = func(*args, **kwargs)
-            end = time.time()
-            print(f"{func.__name__} took {end - start:.4f} seconds")
+            elapsed = (time.perf_counter_ns() - start) / 1_000_000_000
+            logger.debug(f"{func.__name__} took {elapsed:.4f} seconds")
             return result
 
         return wrapper
@@ -374,13 +487,10 @@ class PerformanceHelper:
     @staticmethod
     def assert_execution_time(func, max_seconds: float):
         """Assert function executes within time limit"""
-        import time
-
-        start = time.time()
+        start = time.perf_counter_ns()
         func()
-        end = time.time()
+        execution_time = (time.perf_counter_ns() - start) / 1_000_000_000
 
-        execution_time = end - start
         assert execution_time <= max_seconds, \
             f"Function took {execution_time:.4f}s, expected <= {max_seconds}s"
 
@@ -394,48 +504,55 @@ def skip_if_no_external_services():
     )
 
 
+_PARAM_TX_TYPES = pytest.mark.parametrize(
+    "transaction_type",
+    [TransactionTypeEnum.deposit, TransactionTypeEnum.withdrawal]
+)
+
+_PARAM_WITHDRAWAL_STATUSES = pytest.mark.parametrize(
+    "status",
+    [
+        WithdrawalStatusEnum.pending,
+        WithdrawalStatusEnum.requested,
+        WithdrawalStatusEnum.approved,
+        WithdrawalStatusEnum.completed,
+        WithdrawalStatusEnum.rejected,
+        WithdrawalStatusEnum.cancelled
+    ]
+)
+
+_PARAM_USER_TYPES = pytest.mark.parametrize(
+    "is_admin",
+    [False, True],
+    ids=["regular_user", "admin_user"]
+)
+
+
 def parametrize_transaction_types():
     """Parametrize test with all transaction types"""
-    return pytest.mark.parametrize(
-        "transaction_type",
-        [TransactionTypeEnum.deposit, TransactionTypeEnum.withdrawal]
-    )
+    return _PARAM_TX_TYPES
 
 
 def parametrize_withdrawal_statuses():
     """Parametrize test with all withdrawal statuses"""
-    return pytest.mark.parametrize(
-        "status",
-        [
-            WithdrawalStatusEnum.pending,
-            WithdrawalStatusEnum.requested,
-            WithdrawalStatusEnum.approved,
-            WithdrawalStatusEnum.completed,
-            WithdrawalStatusEnum.rejected,
-            WithdrawalStatusEnum.cancelled
-        ]
-    )
+    return _PARAM_WITHDRAWAL_STATUSES
 
 
 def parametrize_user_types():
     """Parametrize test with regular and admin users"""
-    return pytest.mark.parametrize(
-        "is_admin",
-        [False, True],
-        ids=["regular_user", "admin_user"]
-    )
+    return _PARAM_USER_TYPES
 
 
 # Constants for testing
-TEST_ADDRESSES = [
+TEST_ADDRESSES = (
     "TTest1234567890123456789012345678",
     "TTest2345678901234567890123456789",
     "TTest3456789012345678901234567890",
     "TTest4567890123456789012345678901",
     "TTest5678901234567890123456789012"
-]
+)
 
-TEST_AMOUNTS = [1.0, 10.0, 100.0, 1000.0, 5000.0]
+TEST_AMOUNTS = (1.0, 10.0, 100.0, 1000.0, 5000.0)
 
 TEST_USER_DATA = {
     "username": "testuser",
@@ -1,13 +1,82 @@
 # tests/test_webhooks.py
 
+import asyncio
+import orjson
 import pytest
+from sqlalchemy import select
+from types import MappingProxyType
 from fastapi.testclient import TestClient
-from unittest.mock import patch, AsyncMock
+from httpx import AsyncClient
+from unittest.mock import patch
 from app.models.transaction import Transaction, TransactionTypeEnum, \
     WithdrawalStatusEnum
-from app.models.user import User
-from datetime import datetime
-import json
+from app.services import status_sync
+from tests.helpers import requires_benchmark
+
+# Keep this module on one xdist worker; under --dist=loadgroup that is
+# what --dist=loadfile would do for the whole run
+pytestmark = pytest.mark.xdist_group("webhooks")
+
+PAYMENT_URL = "/api/webhooks/payment"
+BLOCKCHAIN_URL = "/api/webhooks/blockchain"
+_JSON_HEADERS = {"Content-Type": "application/json"}
+
+# Fixed webhook timestamp; the handlers don't validate it, and a constant
+# keeps payloads identical between runs
+_FIXED_TS = 1_700_000_000
+_BASE_PAYMENT_PAYLOAD = MappingProxyType({"status": "success",
+                                          "timestamp": _FIXED_TS})
+
+# Oversized payment webhook body (simulates a potential attack), encoded
+# once at import
+_LARGE_BODY = orjson.dumps({
+    "transaction_id": 1,
+    "status": "success",
+    "large_data": "x" * 10000  # 10KB of data
+})
+
+# Stubbed result of the status sync the webhooks trigger on completion
+_SYNC_RESULT = {"changed": True, "new_status": "available"}
+
+
+def _fetch_tx_state(db, transaction_id, *columns):
+    """Read just the given Transaction columns straight from the database"""
+    return db.execute(select(*columns).where(
+        Transaction.id == transaction_id)).one()
+
+
+@pytest.fixture
+def hook_stub(monkeypatch):
+    """Replace the status-sync hook with a stub recording its calls"""
+    calls = []
+
+    def _hook(db, transaction_id, source):
+        calls.append((db, transaction_id, source))
+        return _SYNC_RESULT
+
+    monkeypatch.setattr(status_sync, "hook_transaction_completed", _hook)
+    return calls
+
+
+@pytest.fixture
+def batch_hook_stub(monkeypatch):
+    """Replace the batch status-sync hook with a stub recording its calls"""
+    calls = []
+
+    def _hook(db, transaction_ids, source):
+        calls.append((db, transaction_ids, source))
+        return {"results": [{"transaction_id": transaction_id, **_SYNC_RESULT}
+                            for transaction_id in transaction_ids]}
+
+    monkeypatch.setattr(status_sync, "hook_transactions_completed", _hook)
+    return calls
+
+
+@pytest.fixture
+def standard_confirm_settings(settings_override):
+    """19 required confirmations with auto-completion enabled"""
+    settings_override(current_confirmations_required=19,
+                     auto_complete_enabled=True)
 
 
 class TestWebhookEndpoints:
@@ -28,253 +97,177 @@ class TestWebhookEndpoints:
 class TestPaymentWebhook:
     """Test payment system webhook handling"""
 
-    def test_payment_webhook_success(self, client: TestClient,
-                                     test_withdrawal_transaction, db):
-        """Test successful payment webhook processing"""
-        payload = {
+    pytestmark = pytest.mark.asyncio
+
+    @pytest.mark.parametrize("payload,expected,tx_status,tx_comment", [
+        pytest.param(
+            {"status": "success", "payment_system_id": "pay_123456"},
+            {"status": "success", "sync_result": _SYNC_RESULT},
+            WithdrawalStatusEnum.completed, "Подтверждено платежной системой",
+            id="success"),
+        pytest.param(
+            {"status": "failed", "error_code": "INSUFFICIENT_FUNDS"},
+            {"status": "processed"},
+            WithdrawalStatusEnum.rejected, "Отклонено платежной системой",
+            id="failure"),
+        pytest.param(
+            {"status": "unknown_status"},
+            {
+                "status": "error",
+                "reason": "Unsupported payment status: unknown_status"
+            },
+            WithdrawalStatusEnum.requested, None,
+            id="unsupported_status"),
+    ])
+    async def test_payment_webhook(self, async_client: AsyncClient,
+                                   test_withdrawal_transaction, db, hook_stub,
+                                   payload, expected, tx_status, tx_comment):
+        """Test payment webhook replies and their effect on the withdrawal"""
+        body = {
+            **_BASE_PAYMENT_PAYLOAD,
             "transaction_id": test_withdrawal_transaction.id,
-            "status": "success",
-            "payment_system_id": "pay_123456",
-            "timestamp": int(datetime.utcnow().timestamp())
+            **payload
         }
 
-        with patch(
-                'app.services.status_sync.hook_transaction_completed') as mock_sync:
-            mock_sync.return_value = {
-                "user_id": test_withdrawal_transaction.user_id,
-                "changed": True,
-                "new_status": "available"
-            }
-
-            response = client.post("/api/webhooks/payment", json=payload)
-            assert response.status_code == 200
-
-            data = response.json()
-            assert data["status"] == "success"
-            assert data["transaction_id"] == test_withdrawal_transaction.id
-            assert "sync_result" in data
-
-            # Verify transaction updated
-            db.refresh(test_withdrawal_transaction)
-            assert test_withdrawal_transaction.withdrawal_status == WithdrawalStatusEnum.completed
-            assert test_withdrawal_transaction.processed_at is not None
-
-    def test_payment_webhook_failure(self, client: TestClient,
-                                     test_withdrawal_transaction, db):
-        """Test failed payment webhook processing"""
-        payload = {
-            "transaction_id": test_withdrawal_transaction.id,
-            "status": "failed",
-            "error_code": "INSUFFICIENT_FUNDS",
-            "timestamp": int(datetime.utcnow().timestamp())
-        }
-
-        response = client.post("/api/webhooks/payment", json=payload)
+        response = await async_client.post(PAYMENT_URL, json=body)
         assert response.status_code == 200
 
         data = response.json()
-        assert data["status"] == "processed"
-        assert data["transaction_id"] == test_withdrawal_transaction.id
-
-        # Verify transaction marked as rejected
-        db.refresh(test_withdrawal_transaction)
-        assert test_withdrawal_transaction.withdrawal_status == WithdrawalStatusEnum.rejected
-        assert "Отклонено платежной системой" in test_withdrawal_transaction.comment
+        assert expected.items() <= data.items()
 
-    def test_payment_webhook_missing_transaction_id(self, client: TestClient):
-        """Test payment webhook with missing transaction ID"""
-        payload = {
-            "status": "success",
-            "timestamp": int(datetime.utcnow().timestamp())
-        }
+        assert test_withdrawal_transaction.withdrawal_status == tx_status
+        if tx_comment is not None:
+            assert data["transaction_id"] == test_withdrawal_transaction.id
+            assert tx_comment in test_withdrawal_transaction.comment
+        if tx_status == WithdrawalStatusEnum.completed:
+            assert test_withdrawal_transaction.processed_at is not None
 
-        response = client.post("/api/webhooks/payment", json=payload)
+    @pytest.mark.parametrize("payload,reason", [
+        pytest.param({"status": "success"}, "Missing transaction_id",
+                     id="missing_transaction_id"),
+        pytest.param({"transaction_id": 999999, "status": "success"},
+                     "Transaction not found", id="transaction_not_found"),
+    ])
+    async def test_payment_webhook_without_transaction(
+            self, async_client: AsyncClient, db, payload, reason):
+        """Test payment webhook errors raised before any row is needed"""
+        response = await async_client.post(PAYMENT_URL, json=payload)
         assert response.status_code == 200
+        assert response.json() == {"status": "error", "reason": reason}
 
-        data = response.json()
-        assert data["status"] == "error"
-        assert data["reason"] == "Missing transaction_id"
-
-    def test_payment_webhook_transaction_not_found(self, client: TestClient):
-        """Test payment webhook with non-existent transaction"""
-        payload = {
-            "transaction_id": 999999,
-            "status": "success",
-            "timestamp": int(datetime.utcnow().timestamp())
-        }
 
-        response = client.post("/api/webhooks/payment", json=payload)
-        assert response.status_code == 200
+class TestPaymentWebhookPerformance:
+    """Benchmark of the hot payment webhook path"""
 
-        data = response.json()
-        assert data["status"] == "error"
-        assert data["reason"] == "Transaction not found"
+    @requires_benchmark
+    def test_payment_webhook_success(self, client: TestClient,
+                                     test_withdrawal_transaction, hook_stub,
+                                     benchmark):
+        """Benchmark a successful payment webhook through the app"""
+        body = orjson.dumps({
+            **_BASE_PAYMENT_PAYLOAD,
+            "transaction_id": test_withdrawal_transaction.id
+        })
 
-    def test_payment_webhook_unsupported_status(self, client: TestClient,
-                                                test_withdrawal_transaction):
-        """Test payment webhook with unsupported status"""
-        payload = {
-            "transaction_id": test_withdrawal_transaction.id,
-            "status": "unknown_status",
-            "timestamp": int(datetime.utcnow().timestamp())
-        }
+        response = benchmark(client.post, PAYMENT_URL, content=body,
+                             headers=_JSON_HEADERS)
 
-        response = client.post("/api/webhooks/payment", json=payload)
         assert response.status_code == 200
-
-        data = response.json()
-        assert data["status"] == "error"
-        assert "Unsupported payment status" in data["reason"]
+        assert response.json()["status"] == "success"
 
 
 class TestBlockchainWebhook:
     """Test blockchain confirmation webhook handling"""
 
-    def test_blockchain_webhook_success(self, client: TestClient,
-                                        test_deposit_transaction, db,
-                                        monkeypatch):
-        """Test successful blockchain webhook processing"""
-        # Mock settings
-        from app.core import config
-        monkeypatch.setattr(config.settings, "current_confirmations_required",
-                            19)
-        monkeypatch.setattr(config.settings, "auto_complete_enabled", True)
-
-        payload = {
+    pytestmark = pytest.mark.asyncio
+
+    @pytest.mark.parametrize("settings_overrides,payload,expected,matched", [
+        pytest.param(
+            {"current_confirmations_required": 19,
+             "auto_complete_enabled": True},
+            {},
+            {
+                "status": "auto_completed",
+                "confirmations": 20,
+                "auto_sync_result": _SYNC_RESULT
+            },
+            True, id="success"),
+        pytest.param(
+            {"current_confirmations_required": 19},
+            {"confirmations": 15},  # Less than required 19
+            {
+                "status": "pending",
+                "confirmations": 15,
+                "required_confirmations": 19
+            },
+            False, id="insufficient_confirmations"),
+        pytest.param(
+            {"current_confirmations_required": 19,
+             "auto_complete_enabled": False},
+            {},
+            {
+                "status": "confirmed",
+                "confirmations": 20,
+                "note": "Auto-completion disabled, manual review required"
+            },
+            True, id="auto_complete_disabled"),
+        pytest.param(
+            {"current_confirmations_required": 19},
+            {"address": "TNonExistent123456789012345678901", "amount": 999.99},
+            {
+                "status": "no_match",
+                "address": "TNonExistent123456789012345678901",
+                "amount": 999.99
+            },
+            False, id="no_matching_transaction"),
+        pytest.param(
+            {},
+            {"event_type": "balance_updated"},
+            {
+                "status": "ignored",
+                "reason": "Unsupported event type: balance_updated"
+            },
+            False, id="wrong_event_type"),
+    ])
+    async def test_blockchain_webhook(self, async_client: AsyncClient,
+                                      test_deposit_transaction, db,
+                                      settings_override, hook_stub,
+                                      settings_overrides,
+                                      payload, expected, matched):
+        """Test blockchain webhook replies and their effect on the deposit"""
+        settings_override(**settings_overrides)
+
+        body = {
             "event_type": "transaction_confirmed",
             "txid": "blockchain_tx_123456",
             "confirmations": 20,
             "address": test_deposit_transaction.wallet_address,
             "amount": test_deposit_transaction.amount,
             "token": "USDT",
-            "timestamp": int(datetime.utcnow().timestamp())
+            **payload
         }
 
-        with patch(
-                'app.services.status_sync.hook_transaction_completed') as mock_sync:
-            mock_sync.return_value = {
-                "user_id": test_deposit_transaction.user_id,
-                "changed": True,
-                "new_status": "available"
-            }
+        response = await async_client.post(BLOCKCHAIN_URL, json=body)
+        assert response.status_code == 200
 
-            response = client.post("/api/webhooks/blockchain", json=payload)
-            assert response.status_code == 200
+        data = response.json()
+        assert expected.items() <= data.items()
 
-            data = response.json()
-            assert data["status"] == "auto_completed"
+        if matched:
             assert data["transaction_id"] == test_deposit_transaction.id
-            assert data["confirmations"] == 20
-            assert "auto_sync_result" in data
-
-            # Verify transaction updated
-            db.refresh(test_deposit_transaction)
             assert test_deposit_transaction.withdrawal_status == WithdrawalStatusEnum.completed
             assert test_deposit_transaction.txid == "blockchain_tx_123456"
             assert "20 confirmations" in test_deposit_transaction.comment
+        else:
+            assert test_deposit_transaction.withdrawal_status == WithdrawalStatusEnum.pending
+            assert test_deposit_transaction.txid is None
 
-    def test_blockchain_webhook_insufficient_confirmations(self,
-                                                           client: TestClient,
-                                                           test_deposit_transaction,
-                                                           monkeypatch):
-        """Test blockchain webhook with insufficient confirmations"""
-        from app.core import config
-        monkeypatch.setattr(config.settings, "current_confirmations_required",
-                            19)
-
-        payload = {
-            "event_type": "transaction_confirmed",
-            "txid": "blockchain_tx_123456",
-            "confirmations": 15,  # Less than required 19
-            "address": test_deposit_transaction.wallet_address,
-            "amount": test_deposit_transaction.amount,
-            "token": "USDT"
-        }
-
-        response = client.post("/api/webhooks/blockchain", json=payload)
-        assert response.status_code == 200
-
-        data = response.json()
-        assert data["status"] == "pending"
-        assert data["confirmations"] == 15
-        assert data["required_confirmations"] == 19
-
-    def test_blockchain_webhook_auto_complete_disabled(self,
-                                                       client: TestClient,
-                                                       test_deposit_transaction,
-                                                       db, monkeypatch):
-        """Test blockchain webhook with auto-complete disabled"""
-        from app.core import config
-        monkeypatch.setattr(config.settings, "current_confirmations_required",
-                            19)
-        monkeypatch.setattr(config.settings, "auto_complete_enabled", False)
-
-        payload = {
-            "event_type": "transaction_confirmed",
-            "txid": "blockchain_tx_123456",
-            "confirmations": 20,
-            "address": test_deposit_transaction.wallet_address,
-            "amount": test_deposit_transaction.amount,
-            "token": "USDT"
-        }
-
-        response = client.post("/api/webhooks/blockchain", json=payload)
-        assert response.status_code == 200
-
-        data = response.json()
-        assert data["status"] == "confirmed"
-        assert data["transaction_id"] == test_deposit_transaction.id
-        assert "Auto-completion disabled" in data["note"]
-
-        # Transaction should be confirmed but not completed
-        db.refresh(test_deposit_transaction)
-        assert test_deposit_transaction.withdrawal_status == WithdrawalStatusEnum.completed
-        assert test_deposit_transaction.txid == "blockchain_tx_123456"
-
-    def test_blockchain_webhook_no_matching_transaction(self,
-                                                        client: TestClient,
-                                                        monkeypatch):
-        """Test blockchain webhook with no matching transaction"""
-        from app.core import config
-        monkeypatch.setattr(config.settings, "current_confirmations_required",
-                            19)
-
-        payload = {
-            "event_type": "transaction_confirmed",
-            "txid": "blockchain_tx_123456",
-            "confirmations": 20,
-            "address": "TNonExistent123456789012345678901",
-            "amount": 999.99,
-            "token": "USDT"
-        }
-
-        response = client.post("/api/webhooks/blockchain", json=payload)
-        assert response.status_code == 200
-
-        data = response.json()
-        assert data["status"] == "no_match"
-        assert data["address"] == "TNonExistent123456789012345678901"
-        assert data["amount"] == 999.99
-
-    def test_blockchain_webhook_wrong_event_type(self, client: TestClient):
-        """Test blockchain webhook with wrong event type"""
-        payload = {
-            "event_type": "balance_updated",
-            "txid": "blockchain_tx_123456",
-            "confirmations": 20
-        }
-
-        response = client.post("/api/webhooks/blockchain", json=payload)
-        assert response.status_code == 200
-
-        data = response.json()
-        assert data["status"] == "ignored"
-        assert "Unsupported event type" in data["reason"]
-
-    def test_blockchain_webhook_malformed_payload(self, client: TestClient):
+    async def test_blockchain_webhook_malformed_payload(
+            self, async_client: AsyncClient):
         """Test blockchain webhook with malformed payload"""
         # Test with invalid JSON
-        response = client.post("/api/webhooks/blockchain", data="invalid json")
+        response = await async_client.post(BLOCKCHAIN_URL,
+                                           content="invalid json")
         assert response.status_code == 422
 
         # Test with missing required fields
@@ -283,29 +276,28 @@ class TestBlockchainWebhook:
             # Missing other required fields
         }
 
-        response = client.post("/api/webhooks/blockchain", json=payload)
+        response = await async_client.post(BLOCKCHAIN_URL, json=payload)
         assert response.status_code == 200  # Should handle gracefully
 
 
 class TestWebhookSecurity:
     """Test webhook security and validation"""
 
-    def test_webhook_accepts_post_only(self, client: TestClient):
+    @pytest.mark.asyncio
+    async def test_webhook_accepts_post_only(self,
+                                             async_client: AsyncClient):
         """Test that webhooks only accept POST requests"""
-        endpoints = ["/api/webhooks/payment", "/api/webhooks/blockchain"]
-
-        for endpoint in endpoints:
-            # Test GET
-            response = client.get(endpoint)
-            assert response.status_code == 405
+        requests = [(method, endpoint)
+                    for endpoint in (PAYMENT_URL, BLOCKCHAIN_URL)
+                    for method in ("GET", "PUT", "DELETE")]
 
-            # Test PUT
-            response = client.put(endpoint, json={})
-            assert response.status_code == 405
+        responses = await asyncio.gather(*[
+            async_client.request(method, endpoint)
+            for method, endpoint in requests
+        ])
 
-            # Test DELETE
-            response = client.delete(endpoint)
-            assert response.status_code == 405
+        for (method, endpoint), response in zip(requests, responses):
+            assert response.status_code == 405, f"{method} {endpoint}"
 
     def test_webhook_content_type_validation(self, client: TestClient):
         """Test webhook content type validation"""
@@ -319,14 +311,8 @@ class TestWebhookSecurity:
 
     def test_webhook_large_payload_handling(self, client: TestClient):
         """Test webhook handling of large payloads"""
-        # Create a large payload (simulate potential attack)
-        large_payload = {
-            "transaction_id": 1,
-            "status": "success",
-            "large_data": "x" * 10000  # 10KB of data
-        }
-
-        response = client.post("/api/webhooks/payment", json=large_payload)
+        response = client.post(PAYMENT_URL, content=_LARGE_BODY,
+                               headers=_JSON_HEADERS)
         assert response.status_code in [200, 413,
                                         422]  # Should handle gracefully
 
@@ -335,13 +321,9 @@ class TestWebhookIntegration:
     """Integration tests for webhook processing"""
 
     def test_full_deposit_webhook_flow(self, client: TestClient, test_user,
-                                       test_wallet_address, db, monkeypatch):
+                                       test_wallet_address, db,
+                                       standard_confirm_settings, hook_stub):
         """Test complete deposit webhook processing flow"""
-        from app.core import config
-        monkeypatch.setattr(config.settings, "current_confirmations_required",
-                            19)
-        monkeypatch.setattr(config.settings, "auto_complete_enabled", True)
-
         # Create pending deposit
         transaction = Transaction(
             user_id=test_user.id,
@@ -354,12 +336,6 @@ class TestWebhookIntegration:
         db.add(transaction)
         db.commit()
 
-        # Get initial balance
-        from app.models.user import Balance
-        balance = db.query(Balance).filter(
-            Balance.user_id == test_user.id).first()
-        initial_balance = balance.amount
-
         # Simulate blockchain confirmation webhook
         payload = {
             "event_type": "transaction_confirmed",
@@ -371,38 +347,30 @@ class TestWebhookIntegration:
             "block_height": 12345678
         }
 
-        with patch(
-                'app.services.status_sync.hook_transaction_completed') as mock_sync:
-            mock_sync.return_value = {
-                "user_id": test_user.id,
-                "changed": True,
-                "new_status": "available",
-                "balance_deduction": None
-            }
-
-            response = client.post("/api/webhooks/blockchain", json=payload)
-            assert response.status_code == 200
+        response = client.post("/api/webhooks/blockchain", json=payload)
+        assert response.status_code == 200
 
-            # Verify complete flow
-            data = response.json()
-            assert data["status"] == "auto_completed"
+        # Verify complete flow
+        data = response.json()
+        assert data["status"] == "auto_completed"
 
-            # Verify transaction updated
-            db.refresh(transaction)
-            assert transaction.withdrawal_status == WithdrawalStatusEnum.completed
-            assert transaction.txid == "real_blockchain_tx_789"
-            assert transaction.processed_at is not None
+        # Verify transaction updated in the database
+        state = _fetch_tx_state(db, transaction.id,
+                                Transaction.withdrawal_status,
+                                Transaction.txid, Transaction.processed_at)
+        assert state.withdrawal_status == WithdrawalStatusEnum.completed
+        assert state.txid == "real_blockchain_tx_789"
+        assert state.processed_at is not None
 
-            # Verify status sync was triggered
-            mock_sync.assert_called_once_with(db, transaction.id,
-                                              "blockchain_webhook")
+        # Verify status sync was triggered
+        assert hook_stub == [(db, transaction.id, "blockchain_webhook")]
 
     def test_webhook_error_recovery(self, client: TestClient,
                                     test_withdrawal_transaction, db):
         """Test webhook error handling and recovery"""
         payload = {
-            "transaction_id": test_withdrawal_transaction.id,
-            "status": "success"
+            **_BASE_PAYMENT_PAYLOAD,
+            "transaction_id": test_withdrawal_transaction.id
         }
 
         # Simulate database error during processing
@@ -413,18 +381,19 @@ class TestWebhookIntegration:
             response = client.post("/api/webhooks/payment", json=payload)
             assert response.status_code == 500
 
-            # Verify original transaction unchanged
-            db.refresh(test_withdrawal_transaction)
-            assert test_withdrawal_transaction.withdrawal_status == WithdrawalStatusEnum.requested
-
-    def test_concurrent_webhook_processing(self, client: TestClient, test_user,
-                                           db, monkeypatch):
+            # Verify original transaction unchanged in the database, not
+            # just in memory
+            state = _fetch_tx_state(db, test_withdrawal_transaction.id,
+                                    Transaction.withdrawal_status)
+            assert state.withdrawal_status == WithdrawalStatusEnum.requested
+
+    @pytest.mark.asyncio
+    async def test_concurrent_webhook_processing(self,
+                                                 async_client: AsyncClient,
+                                                 test_user, db,
+                                                 standard_confirm_settings,
+                                                 hook_stub):
         """Test concurrent webhook processing for same transaction"""
-        from app.core import config
-        monkeypatch.setattr(config.settings, "current_confirmations_required",
-                            19)
-        monkeypatch.setattr(config.settings, "auto_complete_enabled", True)
-
         # Create pending transaction
         transaction = Transaction(
             user_id=test_user.id,
@@ -446,45 +415,71 @@ class TestWebhookIntegration:
             "token": "USDT"
         }
 
-        with patch(
-                'app.services.status_sync.hook_transaction_completed') as mock_sync:
-            mock_sync.return_value = {"changed": True}
+        # Fire the same webhook three times at once with one encoded body
+        body = orjson.dumps(payload)
+        responses = await asyncio.gather(*[
+            async_client.post(BLOCKCHAIN_URL, content=body,
+                              headers=_JSON_HEADERS)
+            for _ in range(3)
+        ])
+
+        # All requests should be handled gracefully
+        for response in responses:
+            assert response.status_code in [200,
+                                            409]  # Success or conflict
+
+    @pytest.mark.asyncio
+    async def test_blockchain_webhook_batch(self, async_client: AsyncClient,
+                                            test_deposit_transaction, db,
+                                            standard_confirm_settings,
+                                            batch_hook_stub):
+        """Test one batch request confirming a deposit once"""
+        event = {
+            "event_type": "transaction_confirmed",
+            "txid": "batch_tx_123",
+            "confirmations": 20,
+            "address": test_deposit_transaction.wallet_address,
+            "amount": test_deposit_transaction.amount,
+            "token": "USDT"
+        }
 
-            # Simulate concurrent webhook calls
-            responses = []
-            for i in range(3):
-                response = client.post("/api/webhooks/blockchain",
-                                       json=payload)
-                responses.append(response)
+        response = await async_client.post(BLOCKCHAIN_URL + "/batch",
+                                           json=[event] * 3)
+        assert response.status_code == 200
 
-            # All requests should be handled gracefully
-            for response in responses:
-                assert response.status_code in [200,
-                                                409]  # Success or conflict
+        data = response.json()
+        assert len(data["results"]) == 3
+        assert data["completed"] == 1
+        assert batch_hook_stub == [
+            (db, [test_deposit_transaction.id], "blockchain_webhook")]
 
     def test_webhook_idempotency(self, client: TestClient,
-                                 test_withdrawal_transaction, db):
+                                 test_withdrawal_transaction, db,
+                                 idempotency_cache):
         """Test webhook idempotency (repeated calls should be safe)"""
         payload = {
+            **_BASE_PAYMENT_PAYLOAD,
             "transaction_id": test_withdrawal_transaction.id,
-            "status": "success",
             "idempotency_key": "unique_key_123"
         }
 
+        body = orjson.dumps(payload)
+
         # First webhook call
-        response1 = client.post("/api/webhooks/payment", json=payload)
+        response1 = client.post(PAYMENT_URL, content=body,
+                                headers=_JSON_HEADERS)
         assert response1.status_code == 200
 
         # Get transaction state after first call
-        db.refresh(test_withdrawal_transaction)
         first_status = test_withdrawal_transaction.withdrawal_status
         first_processed_at = test_withdrawal_transaction.processed_at
 
         # Second webhook call (should be idempotent)
-        response2 = client.post("/api/webhooks/payment", json=payload)
+        response2 = client.post(PAYMENT_URL, content=body,
+                                headers=_JSON_HEADERS)
         assert response2.status_code == 200
+        assert response2.json() == response1.json()
 
         # Verify transaction state unchanged
-        db.refresh(test_withdrawal_transaction)
         assert test_withdrawal_transaction.withdrawal_status == first_status
         assert test_withdrawal_transaction.processed_at == first_processed_at
\ No newline at end of file
@@ -1,13 +1,35 @@
 # tests/test_withdrawals.py
 
+import json
+import random
 import pytest
+from functools import lru_cache
+from fastapi import HTTPException
 from fastapi.testclient import TestClient
+from sqlalchemy import select
+from sqlalchemy.orm.attributes import set_committed_value
 from unittest.mock import patch, MagicMock
 from app.models.transaction import Transaction, TransactionTypeEnum, \
     WithdrawalStatusEnum
 from app.models.user import Balance
+from app.api.utils import validate_address_format
+from app.api.withdrawals import cancel_withdrawal
 from datetime import datetime
 
+VALID_ADDR = "TDestination1234567891234567891234"
+_BASE_REQ = {"wallet_address": VALID_ADDR}
+_JSON_HEADERS = {"Content-Type": "application/json"}
+
+
+@lru_cache(maxsize=None)
+def make_withdrawal_request(amount: float,
+                            wallet_address: str = VALID_ADDR) -> bytes:
+    """Build pre-serialized JSON body for a withdrawal request"""
+    body = {**_BASE_REQ, "amount": amount}
+    if wallet_address != VALID_ADDR:
+        body["wallet_address"] = wallet_address
+    return json.dumps(body).encode()
+
 
 class TestWithdrawalAPI:
     """Test withdrawal API endpoints"""
@@ -21,17 +43,15 @@ class TestWithdrawalAPI:
         balance.amount = 1000.0
         db.commit()
 
-        request_data = {
-            "amount": 100.0,
-            "wallet_address": "TDestination123456789012345678901"
-        }
+        body = make_withdrawal_request(100.0)
 
         with patch(
                 'app.core.config.settings.calculate_withdrawal_fee') as mock_fee:
             mock_fee.return_value = 5.0  # 5 USDT fee
 
             response = client.post("/api/withdrawals/request",
-                                   json=request_data, headers=auth_headers)
+                                   content=body,
+                                   headers={**_JSON_HEADERS, **auth_headers})
             assert response.status_code == 200
 
             data = response.json()
@@ -42,8 +62,7 @@ class TestWithdrawalAPI:
             assert withdrawal_data["amount"] == 100.0
             assert withdrawal_data["fee_amount"] == 5.0
             assert withdrawal_data["total_deducted"] == 105.0
-            assert withdrawal_data["wallet_address"] == request_data[
-                "wallet_address"]
+            assert withdrawal_data["wallet_address"] == VALID_ADDR
             assert withdrawal_data["status"] == "requested"
             assert withdrawal_data["remaining_balance"] == 895.0  # 1000 - 105
 
@@ -57,43 +76,35 @@ class TestWithdrawalAPI:
         balance.amount = 50.0
         db.commit()
 
-        request_data = {
-            "amount": 100.0,
-            "wallet_address": "TDestination123456789012345678901"
-        }
+        body = make_withdrawal_request(100.0)
 
         with patch(
                 'app.core.config.settings.calculate_withdrawal_fee') as mock_fee:
             mock_fee.return_value = 5.0
 
             response = client.post("/api/withdrawals/request",
-                                   json=request_data, headers=auth_headers)
+                                   content=body,
+                                   headers={**_JSON_HEADERS, **auth_headers})
             assert response.status_code == 400
             assert "Insufficient balance" in response.json()["detail"]
 
     def test_request_withdrawal_amount_too_small(self, client: TestClient,
                                                  auth_headers):
         """Test withdrawal request with amount below minimum"""
-        request_data = {
-            "amount": 2.0,  # Below minimum (5.0)
-            "wallet_address": "TDestination123456789012345678901"
-        }
+        body = make_withdrawal_request(2.0)  # Below minimum (5.0)
 
-        response = client.post("/api/withdrawals/request", json=request_data,
-                               headers=auth_headers)
+        response = client.post("/api/withdrawals/request", content=body,
+                               headers={**_JSON_HEADERS, **auth_headers})
         assert response.status_code == 400
         assert "Amount must be between" in response.json()["detail"]
 
     def test_request_withdrawal_amount_too_large(self, client: TestClient,
                                                  auth_headers):
         """Test withdrawal request with amount above maximum"""
-        request_data = {
-            "amount": 10000.0,  # Above maximum (5000.0)
-            "wallet_address": "TDestination123456789012345678901"
-        }
+        body = make_withdrawal_request(10000.0)  # Above maximum (5000.0)
 
-        response = client.post("/api/withdrawals/request", json=request_data,
-                               headers=auth_headers)
+        response = client.post("/api/withdrawals/request", content=body,
+                               headers={**_JSON_HEADERS, **auth_headers})
         assert response.status_code == 400
         assert "Amount must be between" in response.json()["detail"]
 
@@ -109,25 +120,21 @@ class TestWithdrawalAPI:
         ]
 
         for address in invalid_addresses:
-            request_data = {
-                "amount": 100.0,
-                "wallet_address": address
-            }
+            body = make_withdrawal_request(100.0, address)
 
             response = client.post("/api/withdrawals/request",
-                                   json=request_data, headers=auth_headers)
+                                   content=body,
+                                   headers={**_JSON_HEADERS, **auth_headers})
             assert response.status_code == 400
             assert "Invalid TRC20 wallet address format" in response.json()[
                 "detail"]
 
     def test_request_withdrawal_unauthorized(self, client: TestClient):
         """Test withdrawal request without authentication"""
-        request_data = {
-            "amount": 100.0,
-            "wallet_address": "TDestination123456789012345678901"
-        }
+        body = make_withdrawal_request(100.0)
 
-        response = client.post("/api/withdrawals/request", json=request_data)
+        response = client.post("/api/withdrawals/request", content=body,
+                               headers=_JSON_HEADERS)
         assert response.status_code == 401
 
     def test_get_user_withdrawals_empty(self, client: TestClient,
@@ -201,7 +208,7 @@ class TestWithdrawalAPI:
             amount=100.0,
             transaction_type=TransactionTypeEnum.withdrawal,
             withdrawal_status=WithdrawalStatusEnum.requested,
-            wallet_address="TDestination123456789012345678901",
+            wallet_address=VALID_ADDR,
             comment="Test withdrawal"
         )
         db.add(transaction)
@@ -251,7 +258,7 @@ class TestWithdrawalAPI:
             amount=100.0,
             transaction_type=TransactionTypeEnum.withdrawal,
             withdrawal_status=WithdrawalStatusEnum.completed,
-            wallet_address="TDestination123456789012345678901"
+            wallet_address=VALID_ADDR
         )
         db.add(transaction)
         db.commit()
@@ -271,7 +278,7 @@ class TestWithdrawalAPI:
             amount=100.0,
             transaction_type=TransactionTypeEnum.withdrawal,
             withdrawal_status=WithdrawalStatusEnum.requested,
-            wallet_address="TDestination123456789012345678901"
+            wallet_address=VALID_ADDR
         )
         db.add(transaction)
         db.commit()
@@ -289,8 +296,27 @@ class TestWithdrawalAPI:
 class TestWithdrawalValidation:
     """Test withdrawal request validation"""
 
+    @pytest.fixture(autouse=True, scope="class")
+    def mock_withdrawal_side_effects(self):
+        """Patch fee calculation and status sync for validation requests"""
+        with patch(
+                'app.core.config.Settings.calculate_withdrawal_fee') as mock_fee:
+            mock_fee.return_value = 2.0
+
+            with patch(
+                    'app.services.status_sync.hook_transaction_status_changed'):
+                yield mock_fee
+
+    @pytest.mark.parametrize("amount,expected_status", [
+        (0, 422),  # Zero amount
+        (-10, 422),  # Negative amount
+        (2.0, 400),  # Below minimum (5.0)
+        (6000, 400),  # Above maximum (5000.0)
+        (50, 200),  # Valid amount
+    ])
     def test_withdrawal_amount_validation(self, client: TestClient,
-                                          auth_headers, test_user, db):
+                                          auth_headers, test_user, db,
+                                          amount, expected_status):
         """Test various amount validation scenarios"""
         # Set high balance to avoid balance issues
         balance = db.query(Balance).filter(
@@ -298,32 +324,26 @@ class TestWithdrawalValidation:
         balance.amount = 10000.0
         db.commit()
 
-        test_cases = [
-            (0, 422),  # Zero amount
-            (-10, 422),  # Negative amount
-            (2.0, 400),  # Below minimum (5.0)
-            (6000, 400),  # Above maximum (5000.0)
-            (50, 200),  # Valid amount
-        ]
-
-        for amount, expected_status in test_cases:
-            with patch(
-                    'app.core.config.settings.calculate_withdrawal_fee') as mock_fee:
-                mock_fee.return_value = 2.0
-
-                with patch(
-                        'app.services.status_sync.hook_transaction_status_changed'):
-                    request_data = {
-                        "amount": amount,
-                        "wallet_address": "TDestination123456789012345678901"
-                    }
-                    response = client.post("/api/withdrawals/request",
-                                           json=request_data,
-                                           headers=auth_headers)
-                    assert response.status_code == expected_status
-
+        body = make_withdrawal_request(amount)
+        response = client.post("/api/withdrawals/request",
+                               content=body,
+                               headers={**_JSON_HEADERS, **auth_headers})
+        assert response.status_code == expected_status
+
+    @pytest.mark.parametrize("address,expected_status", [
+        (VALID_ADDR, 200),
+        ("T123456789123456789123456789123456", 200),
+        ("TXYZ567891234567891234567891234567", 200),
+        ("short", 400),  # Too short
+        ("BDestination12345678901234567890123456", 400),  # Wrong prefix
+        ("TDestination1234567890123456789012345678901234567890",
+         400),  # Too long
+        ("TDestination12345678901234567890!", 400),  # Invalid characters
+        ("", 400),  # Empty
+    ])
     def test_withdrawal_address_validation(self, client: TestClient,
-                                           auth_headers, test_user, db):
+                                           auth_headers, test_user, db,
+                                           address, expected_status):
         """Test wallet address validation"""
         # Set sufficient balance
         balance = db.query(Balance).filter(
@@ -331,46 +351,25 @@ class TestWithdrawalValidation:
         balance.amount = 1000.0
         db.commit()
 
-        valid_addresses = [
-            "TDestination123456789012345678901",
-            "T1234567890123456789012345678901234",
-            "TXYZ567890123456789012345678901234"
-        ]
-
-        invalid_addresses = [
-            "short",  # Too short
-            "BDestination12345678901234567890123456",  # Wrong prefix
-            "TDestination1234567890123456789012345678901234567890",  # Too long
-            "TDestination12345678901234567890!",  # Invalid characters
-            "",  # Empty
+        body = make_withdrawal_request(50.0, address)
+        response = client.post("/api/withdrawals/request",
+                               content=body,
+                               headers={**_JSON_HEADERS, **auth_headers})
+        assert response.status_code == expected_status
+
+    def test_request_withdrawal_valid_addresses(self):
+        """Test validator accepts generated base58 addresses in bulk"""
+        base58 = "123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz"
+        rng = random.Random(42)
+        addresses = [
+            "T" + "".join(rng.choices(base58, k=33)) for _ in range(10000)
         ]
 
-        # Test valid addresses
-        with patch(
-                'app.core.config.settings.calculate_withdrawal_fee') as mock_fee:
-            mock_fee.return_value = 5.0
+        assert all(validate_address_format(addr) for addr in addresses)
 
-            with patch(
-                    'app.services.status_sync.hook_transaction_status_changed'):
-                for address in valid_addresses:
-                    request_data = {
-                        "amount": 50.0,
-                        "wallet_address": address
-                    }
-                    response = client.post("/api/withdrawals/request",
-                                           json=request_data,
-                                           headers=auth_headers)
-                    assert response.status_code == 200
-
-        # Test invalid addresses
-        for address in invalid_addresses:
-            request_data = {
-                "amount": 50.0,
-                "wallet_address": address
-            }
-            response = client.post("/api/withdrawals/request",
-                                   json=request_data, headers=auth_headers)
-            assert response.status_code == 400
+        # Base58 excludes 0, O, I and l
+        assert not validate_address_format("T" + "0" * 33)
+        assert not validate_address_format("T" + "l" * 33)
 
 
 class TestWithdrawalIntegration:
@@ -394,27 +393,25 @@ class TestWithdrawalIntegration:
                 mock_sync.return_value = {"changed": True}
 
                 # Request withdrawal
-                request_data = {
-                    "amount": 200.0,
-                    "wallet_address": "TDestination123456789012345678901"
-                }
+                body = make_withdrawal_request(200.0)
                 response = client.post("/api/withdrawals/request",
-                                       json=request_data, headers=auth_headers)
+                                       content=body,
+                                   headers={**_JSON_HEADERS, **auth_headers})
 
                 assert response.status_code == 200
                 data = response.json()
                 transaction_id = data["data"]["transaction_id"]
 
                 # Verify transaction in database
-                transaction = db.query(Transaction).filter(
-                    Transaction.id == transaction_id).first()
-                assert transaction is not None
-                assert transaction.amount == 200.0
-                assert transaction.transaction_type == TransactionTypeEnum.withdrawal
-                assert transaction.withdrawal_status == WithdrawalStatusEnum.requested
-                assert transaction.wallet_address == request_data[
-                    "wallet_address"]
-                assert transaction.user_id == test_user.id
+                row = db.execute(
+                    select(Transaction.amount, Transaction.transaction_type,
+                           Transaction.withdrawal_status,
+                           Transaction.wallet_address, Transaction.user_id)
+                    .where(Transaction.id == transaction_id)
+                ).one()
+                assert tuple(row) == (200.0, TransactionTypeEnum.withdrawal,
+                                      WithdrawalStatusEnum.requested,
+                                      VALID_ADDR, test_user.id)
 
                 # Verify balance deducted
                 db.refresh(balance)
@@ -438,13 +435,11 @@ class TestWithdrawalIntegration:
                     'app.services.status_sync.hook_transaction_status_changed'):
                 mock_fee.return_value = 8.0
 
-                request_data = {
-                    "amount": 100.0,
-                    "wallet_address": "TDestination123456789012345678901"
-                }
+                body = make_withdrawal_request(100.0)
 
                 response = client.post("/api/withdrawals/request",
-                                       json=request_data, headers=auth_headers)
+                                       content=body,
+                                   headers={**_JSON_HEADERS, **auth_headers})
                 assert response.status_code == 200
 
                 # Check balance deducted
@@ -460,7 +455,7 @@ class TestWithdrawalIntegration:
             amount=150.0,
             transaction_type=TransactionTypeEnum.withdrawal,
             withdrawal_status=WithdrawalStatusEnum.pending,
-            wallet_address="TDestination123456789012345678901"
+            wallet_address=VALID_ADDR
         )
         db.add(transaction)
 
@@ -494,4 +489,70 @@ class TestWithdrawalIntegration:
                 assert balance.amount == 657.5  # 500 + 150 + 7.5
 
                 # Verify status sync was called
-                mock_sync.assert_called_once()
\ No newline at end of file
+                mock_sync.assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_concurrent_cancel_no_lost_update(self, test_user, db):
+        """Test that a racing second cancellation refunds nothing"""
+        transaction = Transaction(
+            user_id=test_user.id,
+            amount=100.0,
+            transaction_type=TransactionTypeEnum.withdrawal,
+            withdrawal_status=WithdrawalStatusEnum.requested,
+            wallet_address=VALID_ADDR
+        )
+        db.add(transaction)
+
+        balance = db.query(Balance).filter(
+            Balance.user_id == test_user.id).first()
+        balance.amount = 500.0
+        db.commit()
+
+        with patch('app.core.config.Settings.calculate_withdrawal_fee',
+                   create=True, return_value=5.0), \
+                patch('app.api.withdrawals.hook_transaction_status_changed'):
+            result = await cancel_withdrawal(transaction.id, db=db,
+                                             current_user=test_user)
+            assert result["data"]["new_balance"] == 605.0
+
+            # A racing request read the row before the first cancel
+            # committed: its copy still says requested, so only the
+            # guarded UPDATE can stop it
+            set_committed_value(transaction, "withdrawal_status",
+                                WithdrawalStatusEnum.requested)
+            with pytest.raises(HTTPException) as exc_info:
+                await cancel_withdrawal(transaction.id, db=db,
+                                        current_user=test_user)
+            assert exc_info.value.status_code == 400
+
+        status_row = db.execute(select(Transaction.withdrawal_status).where(
+            Transaction.id == transaction.id)).scalar_one()
+        assert status_row == WithdrawalStatusEnum.cancelled
+
+        refunded = db.execute(select(Balance.amount).where(
+            Balance.user_id == test_user.id)).scalar_one()
+        assert refunded == 605.0  # 500 + 100 + 5, refunded once
+
+    @pytest.mark.asyncio
+    async def test_cancel_refunds_first_of_several_balances(
+            self, test_user, db, settings_override):
+        """Test that a user with two balance rows is refunded exactly once"""
+        transaction = Transaction(
+            user_id=test_user.id,
+            amount=100.0,
+            transaction_type=TransactionTypeEnum.withdrawal,
+            withdrawal_status=WithdrawalStatusEnum.requested,
+            wallet_address=VALID_ADDR
+        )
+        db.add_all([transaction, Balance(user_id=test_user.id, amount=0.0)])
+        db.commit()
+        settings_override(calculate_withdrawal_fee=5.0)
+
+        with patch('app.api.withdrawals.hook_transaction_status_changed'):
+            result = await cancel_withdrawal(transaction.id, db=db,
+                                             current_user=test_user)
+        assert result["data"]["new_balance"] == 1105.0
+
+        amounts = db.scalars(select(Balance.amount).where(
+            Balance.user_id == test_user.id).order_by(Balance.id)).all()
+        assert amounts == [1105.0, 0.0]  # 1000 + 100 + 5 on the first row